@@ -0,0 +1,3 @@
+"""
+Helpers shared by index_prisma.py and the runbooks.
+"""
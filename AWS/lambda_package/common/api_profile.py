@@ -0,0 +1,130 @@
+"""
+Profile of the AWS API calls made by each runbook.
+
+botocore event handlers, registered by the session pool on every session handed to the runbooks,
+record each API call: operation, latency, retry attempts and error code. Calls are attributed to
+the runbook active in the calling thread, set by the dispatcher around each runbook run; calls
+made outside a runbook run (e.g. listing the enabled regions) are attributed to 'dispatcher'.
+Tasks started with common/task_graph.py keep the runbook of the thread that started them.
+
+The profile of an invocation, as returned by profiler.take():
+
+    {runbook_id: {'service.Operation': {
+        'calls'     : number of calls
+        'retries'   : total retry attempts made by botocore
+        'errors'    : {error code: number of calls that failed with it}
+        'total_ms'  : total latency, in milliseconds, retries included
+        'max_ms'    : latency of the slowest call
+    }}}
+
+API_PROFILE=false turns the profile off.
+"""
+
+from contextlib import contextmanager
+import os
+import threading
+import time
+
+UNATTRIBUTED = 'dispatcher'
+
+
+class ApiProfiler(object):
+
+    def __init__(self, enabled=True):
+        self.enabled = enabled
+        self.local   = threading.local()
+        self.profile = {}
+        self.lock    = threading.Lock()
+
+    def active_runbook(self):
+        return getattr(self.local, 'runbook_id', None)
+
+    @contextmanager
+    def attribute(self, runbook_id):
+        """
+        Attribute the API calls made by the enclosed block, in this thread, to a runbook
+        """
+
+        previous = self.active_runbook()
+        self.local.runbook_id = runbook_id
+
+        try:
+            yield
+        finally:
+            self.local.runbook_id = previous
+
+    def bind(self, func):
+        """
+        Wrap a callable run in another thread, so its API calls are attributed to the current runbook
+        """
+
+        runbook_id = self.active_runbook()
+
+        if runbook_id is None:
+            return func
+
+        def wrapper(*args, **kwargs):
+            with self.attribute(runbook_id):
+                return func(*args, **kwargs)
+
+        return wrapper
+
+    def take(self):
+        """
+        Profile of the calls recorded since the last take, see the module docstring
+        """
+
+        with self.lock:
+            profile, self.profile = self.profile, {}
+
+        return profile
+
+    def record(self, context, retries, error):
+        if context is None or 'profile_start' not in context:
+            return
+
+        latency = round((time.time() - context.pop('profile_start')) * 1000, 2)
+        runbook_id = context.pop('profile_runbook') or UNATTRIBUTED
+        operation = context.pop('profile_operation')
+
+        with self.lock:
+            stats = self.profile.setdefault(runbook_id, {}).setdefault(operation, {
+                'calls': 0, 'retries': 0, 'errors': {}, 'total_ms': 0, 'max_ms': 0
+            })
+
+            stats['calls']    += 1
+            stats['retries']  += retries
+            stats['total_ms']  = round(stats['total_ms'] + latency, 2)
+            stats['max_ms']    = max(stats['max_ms'], latency)
+
+            if error is not None:
+                stats['errors'][error] = stats['errors'].get(error, 0) + 1
+
+    def api_hooks(self):
+        """
+        botocore event handlers recording the API calls, as (event, handler) tuples
+        """
+
+        if not self.enabled:
+            return []
+
+        # before-parameter-build, rather than before-call, also fires for the stubbed and replayed calls
+        def start(model=None, context=None, **kwargs):
+            if context is not None:
+                context['profile_start'] = time.time()
+                context['profile_runbook'] = self.active_runbook()
+                context['profile_operation'] = '{0}.{1}'.format(model.service_model.service_name, model.name)
+
+        def after_call(parsed=None, context=None, **kwargs):
+            parsed = parsed or {}
+            retries = parsed.get('ResponseMetadata', {}).get('RetryAttempts', 0)
+            self.record(context, retries, parsed.get('Error', {}).get('Code'))
+
+        # Raised after the retries, e.g. connection errors
+        def after_call_error(exception=None, context=None, **kwargs):
+            self.record(context, 0, type(exception).__name__)
+
+        return [('before-parameter-build', start), ('after-call', after_call), ('after-call-error', after_call_error)]
+
+
+profiler = ApiProfiler(os.getenv('API_PROFILE', 'true').strip().lower() != 'false')
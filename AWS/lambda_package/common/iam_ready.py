@@ -0,0 +1,80 @@
+"""
+Readiness checks for newly created IAM resources.
+
+IAM is eventually consistent: a role or user can be returned by IAM and still be unknown to the
+other services for a few seconds. Rather than sleeping for a fixed time, wait for IAM to return the
+resource, then retry the dependent call with an exponential backoff (with jitter) for as long as it
+fails with an error caused by the propagation delay.
+"""
+
+import random
+import time
+
+from botocore.exceptions import ClientError, WaiterError
+
+# Upper bound of the time spent waiting for a resource, in seconds
+MAX_WAIT = 30
+
+
+def wait_for_role(iam, role_name, max_wait=MAX_WAIT):
+    """
+    Wait until IAM returns the role
+
+    returns True if the role exists, False if the wait timed out
+    """
+
+    return wait_for(iam, 'role_exists', max_wait, RoleName=role_name)
+
+
+def wait_for_user(iam, user_name, max_wait=MAX_WAIT):
+    """
+    Wait until IAM returns the user
+
+    returns True if the user exists, False if the wait timed out
+    """
+
+    return wait_for(iam, 'user_exists', max_wait, UserName=user_name)
+
+
+def wait_for(iam, waiter_name, max_wait, **kwargs):
+    try:
+        iam.get_waiter(waiter_name).wait(WaiterConfig={'Delay': 1, 'MaxAttempts': max_wait}, **kwargs)
+    except WaiterError as e:
+        print('Timed out waiting for IAM ({0}): {1}'.format(waiter_name, str(e)))
+        return False
+
+    return True
+
+
+def retry_on_propagation(call, error_codes, max_wait=MAX_WAIT, base_delay=0.5, max_delay=5, **kwargs):
+    """
+    Call an AWS API, retrying it while it fails with one of the error codes caused by the
+    propagation delay of a new IAM resource.
+
+    call          : client method, e.g. config.put_configuration_recorder
+    error_codes   : error codes to retry on, e.g. [ 'InvalidRoleException' ]
+    kwargs        : arguments of the call
+
+    returns the response of the call. Raises the last ClientError once max_wait seconds are spent,
+    or right away for any other error.
+    """
+
+    deadline = time.time() + max_wait
+    attempt  = 0
+
+    while True:
+        try:
+            return call(**kwargs)
+        except ClientError as e:
+            if e.response['Error']['Code'] not in error_codes:
+                raise
+
+            # Full jitter: a random delay up to the exponential backoff
+            delay = random.uniform(0, min(max_delay, base_delay * 2 ** attempt))
+
+            if time.time() + delay > deadline:
+                raise
+
+            print('Waiting for IAM propagation ({0}), retrying in {1:.1f}s.'.format(e.response['Error']['Code'], delay))
+            time.sleep(delay)
+            attempt += 1
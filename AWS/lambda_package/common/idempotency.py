@@ -0,0 +1,132 @@
+"""
+Record of the alerts already remediated, keyed on runbook ID + alert ID.
+
+SQS delivers each message at least once, and redelivers the messages of a batch that timed out or
+crashed. index_prisma.py marks each alert done once its runbook has remediated it, and skips the
+alerts found in the store before fetching any credentials or running any describe call.
+
+The store is opt-in, its backend is selected by the IDEMPOTENCY_STORE env variable:
+
+    memory              : kept in the Lambda container, across its warm invocations
+    sqlite:<path>       : kept in a SQLite file, e.g. for local runs (sqlite:/tmp/alerts.db)
+    dynamodb:<table>    : kept in a DynamoDB table, shared by every container. The table has a
+                          string partition key 'alert_key' and its TTL attribute is 'expires'.
+                          IDEMPOTENCY_ENDPOINT points the client at a DynamoDB-compatible endpoint,
+                          e.g. DynamoDB Local (http://localhost:8000).
+    none                : disabled (default)
+
+Entries expire after IDEMPOTENCY_TTL seconds (default 86400).
+"""
+
+from collections import OrderedDict
+import os
+import sqlite3
+import threading
+import time
+
+
+def alert_key(alert):
+    return '{0}#{1}'.format(alert['runbook_id'], alert['alert_id'])
+
+
+class MemoryStore(object):
+
+    def __init__(self, ttl=86400, max_entries=10000):
+        self.ttl         = ttl
+        self.max_entries = max_entries
+        self.entries     = OrderedDict()
+        self.lock        = threading.Lock()
+
+    def is_done(self, key):
+        with self.lock:
+            expires = self.entries.get(key)
+
+        return expires is not None and expires > time.time()
+
+    def mark_done(self, key):
+        with self.lock:
+            self.entries[key] = time.time() + self.ttl
+            self.entries.move_to_end(key)
+
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+
+
+class SQLiteStore(object):
+
+    def __init__(self, path, ttl=86400):
+        self.ttl  = ttl
+        self.lock = threading.Lock()
+        self.db   = sqlite3.connect(path, check_same_thread=False)
+
+        with self.lock, self.db:
+            self.db.execute('CREATE TABLE IF NOT EXISTS alerts (alert_key TEXT PRIMARY KEY, expires REAL)')
+
+    def is_done(self, key):
+        with self.lock:
+            row = self.db.execute('SELECT expires FROM alerts WHERE alert_key = ?', (key,)).fetchone()
+
+        return row is not None and row[0] > time.time()
+
+    def mark_done(self, key):
+        now = time.time()
+
+        with self.lock, self.db:
+            self.db.execute('INSERT OR REPLACE INTO alerts (alert_key, expires) VALUES (?, ?)', (key, now + self.ttl))
+            self.db.execute('DELETE FROM alerts WHERE expires <= ?', (now,))
+
+
+class DynamoDBStore(object):
+
+    def __init__(self, table_name, ttl=86400, endpoint_url=None):
+        import boto3
+
+        self.ttl        = ttl
+        self.table_name = table_name
+        self.client     = boto3.session.Session().client('dynamodb', endpoint_url=endpoint_url)
+
+    def is_done(self, key):
+        item = self.client.get_item(
+            TableName = self.table_name,
+            Key = {'alert_key': {'S': key}},
+            ConsistentRead = True
+        ).get('Item')
+
+        # DynamoDB deletes the expired items lazily
+        return item is not None and float(item['expires']['N']) > time.time()
+
+    def mark_done(self, key):
+        self.client.put_item(
+            TableName = self.table_name,
+            Item = {
+                'alert_key': {'S': key},
+                'expires': {'N': str(int(time.time() + self.ttl))}
+            }
+        )
+
+
+def from_env():
+    """
+    Store selected by the IDEMPOTENCY_* env variables, or None if disabled
+    """
+
+    backend = os.getenv('IDEMPOTENCY_STORE', 'none').strip()
+
+    try:
+        ttl = max(0, int(os.getenv('IDEMPOTENCY_TTL', '86400')))
+    except ValueError:
+        ttl = 86400
+
+    if backend.lower() in ('', 'none') or ttl == 0:
+        return None
+
+    if backend.lower() == 'memory':
+        return MemoryStore(ttl)
+
+    if backend.startswith('sqlite:'):
+        return SQLiteStore(backend[len('sqlite:'):], ttl)
+
+    if backend.startswith('dynamodb:'):
+        return DynamoDBStore(backend[len('dynamodb:'):], ttl, os.getenv('IDEMPOTENCY_ENDPOINT') or None)
+
+    raise ValueError('Unknown IDEMPOTENCY_STORE: {}'.format(backend))
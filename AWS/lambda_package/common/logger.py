@@ -0,0 +1,120 @@
+"""
+Structured logging of the dispatcher, one JSON line per record.
+
+A RecordLog collects the fields of an SQS record (or of a sweep/bulk resource) and the time spent
+in each phase: parse, credentials, session, import, check and apply. It is printed as a single
+JSON line once the record is processed, which CloudWatch Logs Insights can query directly, e.g.
+
+    filter outcome = "failed" | stats count(*) by runbook_id, account_id
+    stats avg(timings_ms.apply), max(timings_ms.apply) by runbook_id
+
+The LOG_LEVEL env variable sets the verbosity:
+
+    DEBUG    : every record, with the alert metadata (the resource configuration sent by Prisma Cloud)
+    INFO     : every record, without the metadata (default)
+    WARNING  : failed records only
+    ERROR    : failed records only
+"""
+
+from collections import OrderedDict
+from contextlib import contextmanager
+import json
+import os
+import threading
+import time
+
+LEVELS = {'DEBUG': 10, 'INFO': 20, 'WARNING': 30, 'ERROR': 40}
+
+
+def log_level():
+    return LEVELS.get(os.getenv('LOG_LEVEL', 'INFO').strip().upper(), LEVELS['INFO'])
+
+
+def log_event(level, message, **fields):
+    """
+    Print a JSON line, unless level is below LOG_LEVEL
+    """
+
+    if LEVELS[level] < log_level():
+        return
+
+    line = {'level': level, 'message': message}
+    line.update(fields)
+
+    print(json.dumps(line, default=str))
+
+
+class RecordLog(object):
+
+    def __init__(self, **fields):
+        self.fields  = fields
+        self.timings = {}
+        self.alert   = None
+        self.lock    = threading.Lock()
+        # Phases in progress, by name: [blocks running, start time, enclosing phase]
+        self.running = OrderedDict()
+
+    @contextmanager
+    def phase(self, name):
+        """
+        Time the enclosed block, in milliseconds. The phases in progress are tracked per record,
+        whatever the thread running them, so the time of a phase nested in another one, e.g. a
+        client built during the check or by a worker thread of the apply, is taken out of the
+        outer phase, and the timings add up to the time spent on the record. Blocks of the same
+        phase running at the same time in several threads are timed once, from the first start
+        to the last end.
+        """
+
+        with self.lock:
+            if name in self.running:
+                self.running[name][0] += 1
+            else:
+                enclosing = next(reversed(self.running), None)
+                self.running[name] = [1, time.time(), enclosing]
+
+        try:
+            yield
+        finally:
+            with self.lock:
+                self.running[name][0] -= 1
+
+                if self.running[name][0] == 0:
+                    _, start, enclosing = self.running.pop(name)
+                    elapsed = round((time.time() - start) * 1000, 2)
+
+                    self.timings[name] = round(self.timings.get(name, 0) + elapsed, 2)
+
+                    if enclosing is not None:
+                        self.timings[enclosing] = round(self.timings.get(enclosing, 0) - elapsed, 2)
+
+    def set(self, **fields):
+        self.fields.update(fields)
+
+    def set_alert(self, alert):
+        self.alert = alert
+
+        self.set(
+            alert_id    = alert['alert_id'],
+            runbook_id  = alert['runbook_id'],
+            account_id  = alert['account']['account_number'],
+            region      = alert['region'],
+            resource_id = alert['resource_id']
+        )
+
+    def emit(self, outcome=None, error=None):
+        """
+        Print the record line. Failed records are logged at the ERROR level, the others at INFO.
+        """
+
+        if outcome is not None:
+            self.fields['outcome'] = outcome
+
+        if error is not None:
+            self.fields['error'] = error
+
+        fields = dict(self.fields, timings_ms=self.timings)
+
+        if self.alert is not None and log_level() <= LEVELS['DEBUG']:
+            fields['metadata'] = self.alert.get('metadata')
+
+        log_event('ERROR' if fields.get('outcome') == 'failed' else 'INFO', 'record', **fields)
@@ -0,0 +1,143 @@
+"""
+CloudWatch metrics in the Embedded Metric Format (EMF).
+
+The dispatcher records its metrics in a buffer, which is flushed once per invocation as EMF JSON
+lines on stdout. CloudWatch Logs extracts the metrics from the Lambda log stream, so no API call
+is made, and the same lines can be read offline.
+
+Metrics (namespace METRICS_NAMESPACE, default PrismaRemediation):
+
+    BatchSize                      records received per invocation
+    Records, Succeeded, Failed     per RunbookId, records processed / succeeded / failed
+    Latency                        per RunbookId, milliseconds spent on a record
+    ApiCalls, Throttles            per RunbookId, AWS API calls made with the pooled sessions and
+                                   throttled API call attempts. Calls are attributed to the runbook
+                                   active in the calling thread (see common/api_profile.py), or to
+                                   'dispatcher'.
+
+METRICS_ENABLED=false turns the metrics off.
+"""
+
+import json
+import os
+import threading
+import time
+
+from common.api_profile import UNATTRIBUTED, profiler
+
+# Error codes of the throttled API calls
+THROTTLE_CODES = frozenset([
+    'Throttling', 'ThrottlingException', 'ThrottledException', 'RequestThrottledException',
+    'TooManyRequestsException', 'RequestLimitExceeded', 'SlowDown', 'RequestThrottled',
+    'ProvisionedThroughputExceededException', 'BandwidthLimitExceeded', 'PriorRequestNotComplete',
+    'EC2ThrottledException'
+])
+
+# EMF accepts at most 100 values per metric
+MAX_VALUES = 100
+
+
+class MetricsBuffer(object):
+
+    def __init__(self, namespace, enabled=True):
+        self.namespace = namespace
+        self.enabled   = enabled
+        self.values    = {}
+        self.lock      = threading.Lock()
+
+    def put(self, name, value, unit='Count', **dimensions):
+        """
+        Record a value. Counts are summed until the flush, the other values are kept as a list.
+        """
+
+        if not self.enabled:
+            return
+
+        key = (tuple(sorted(dimensions.items())), name, unit)
+
+        with self.lock:
+            if unit == 'Count':
+                self.values[key] = self.values.get(key, 0) + value
+            else:
+                self.values.setdefault(key, []).append(value)
+
+    def flush(self):
+        """
+        Print the buffered metrics, one EMF document per set of dimensions, and empty the buffer
+        """
+
+        with self.lock:
+            values, self.values = self.values, {}
+
+        documents = {}
+
+        for (dimensions, name, unit), value in sorted(values.items(), key=lambda item: item[0]):
+            documents.setdefault(dimensions, []).append((name, unit, value))
+
+        for dimensions, metrics in documents.items():
+            for document in emf_documents(self.namespace, dict(dimensions), metrics):
+                print(json.dumps(document))
+
+    def api_hooks(self):
+        """
+        botocore event handlers counting the API calls and the throttled attempts of each runbook,
+        as (event, handler) tuples
+        """
+
+        def after_call(**kwargs):
+            self.put('ApiCalls', 1, RunbookId=profiler.active_runbook() or UNATTRIBUTED)
+
+        def needs_retry(response=None, **kwargs):
+            if response is not None and error_code(response[1]) in THROTTLE_CODES:
+                self.put('Throttles', 1, RunbookId=profiler.active_runbook() or UNATTRIBUTED)
+
+        return [('after-call', after_call), ('needs-retry', needs_retry)]
+
+
+def error_code(parsed):
+    return (parsed or {}).get('Error', {}).get('Code')
+
+
+def emf_documents(namespace, dimensions, metrics):
+    """
+    EMF documents of a set of dimensions, split so that no metric has more than MAX_VALUES values
+    """
+
+    chunks = 1
+
+    for name, unit, value in metrics:
+        if isinstance(value, list):
+            chunks = max(chunks, (len(value) + MAX_VALUES - 1) // MAX_VALUES)
+
+    for chunk in range(chunks):
+        document = dict(dimensions)
+        definitions = []
+
+        for name, unit, value in metrics:
+            if isinstance(value, list):
+                value = value[chunk * MAX_VALUES:(chunk + 1) * MAX_VALUES]
+
+                if not value:
+                    continue
+            elif chunk > 0:
+                continue
+
+            document[name] = value
+            definitions.append({'Name': name, 'Unit': unit})
+
+        document['_aws'] = {
+            'Timestamp': int(time.time() * 1000),
+            'CloudWatchMetrics': [{
+                'Namespace': namespace,
+                'Dimensions': [sorted(dimensions)],
+                'Metrics': definitions
+            }]
+        }
+
+        yield document
+
+
+metrics = MetricsBuffer(
+    os.getenv('METRICS_NAMESPACE', 'PrismaRemediation'),
+    os.getenv('METRICS_ENABLED', 'true').strip().lower() != 'false'
+)
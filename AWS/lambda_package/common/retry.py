@@ -0,0 +1,118 @@
+"""
+Retry policy and client-side rate limit shared by every client handed to the runbooks.
+
+Runbooks report a ClientError and give up, so a throttled call during an alert storm would leave
+the resource unremediated. The clients are built with the botocore retry mode set by RETRY_MODE
+(default adaptive, which backs off on throttling errors and slows the client down) and up to
+RETRY_MAX_ATTEMPTS retries (default 10), so throttled calls are retried before they reach the
+runbook.
+
+Each (account, region, service) also gets a token bucket, refilled at API_RATE_LIMIT calls per
+second (default 20, 0 disables it) with a burst of API_RATE_BURST calls (default: API_RATE_LIMIT).
+Every attempt takes a token before it is sent, so the parallel records of a batch stay under the
+service limits together instead of throttling each other.
+"""
+
+import os
+import threading
+import time
+
+
+def env_number(name, default, cast=int):
+    try:
+        return max(0, cast(os.getenv(name, str(default))))
+    except ValueError:
+        return default
+
+
+def client_config():
+    """
+    botocore Config of the retry policy
+    """
+
+    from botocore.config import Config
+
+    mode = os.getenv('RETRY_MODE', 'adaptive').strip().lower()
+
+    if mode not in ('legacy', 'standard', 'adaptive'):
+        mode = 'adaptive'
+
+    return Config(retries={'mode': mode, 'max_attempts': max(1, env_number('RETRY_MAX_ATTEMPTS', 10))})
+
+
+class TokenBucket(object):
+
+    def __init__(self, rate, burst):
+        self.rate     = rate
+        self.capacity = max(1, burst)
+        self.tokens   = self.capacity
+        self.updated  = time.monotonic()
+        self.lock     = threading.Lock()
+
+    def acquire(self):
+        """
+        Take a token, waiting for the bucket to refill if it's empty
+        """
+
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+
+                wait = (1 - self.tokens) / self.rate
+
+            time.sleep(wait)
+
+
+class RateLimiter(object):
+    """
+    Token buckets keyed by (account, region, service), kept across warm invocations
+    """
+
+    def __init__(self, rate, burst=None):
+        self.rate    = rate
+        self.burst   = burst or rate
+        self.buckets = {}
+        self.lock    = threading.Lock()
+
+    def bucket(self, account_id, region_name, service_name):
+        key = (account_id, region_name, service_name)
+
+        with self.lock:
+            if key not in self.buckets:
+                self.buckets[key] = TokenBucket(self.rate, self.burst)
+
+            return self.buckets[key]
+
+    def client_hooks(self, account_id, region_name, service_name):
+        """
+        botocore event handlers of a client, as (event, handler) tuples. before-send fires for every
+        attempt, retries included.
+        """
+
+        bucket = self.bucket(account_id, region_name, service_name)
+
+        # A before-send handler returning a value would replace the response
+        def before_send(**kwargs):
+            bucket.acquire()
+            return None
+
+        return [('before-send', before_send)]
+
+
+def rate_limiter_from_env():
+    """
+    RateLimiter set by the API_RATE_* env variables, or None if disabled
+    """
+
+    rate = env_number('API_RATE_LIMIT', 20, float)
+
+    if rate == 0:
+        return None
+
+    return RateLimiter(rate, env_number('API_RATE_BURST', rate, float))
@@ -0,0 +1,66 @@
+"""
+Registry of the runbooks available in the runbooks folder.
+
+The registry lists the runbook files once, at cold start, so an alert mapped to a runbook that
+doesn't exist is rejected before any credential or session is fetched. Runbook modules are
+imported on first use (or preloaded) and cached, which turns dispatching into a dict lookup.
+"""
+
+from importlib import import_module
+import os
+import threading
+
+
+class RunbookRegistry(object):
+
+    def __init__(self, runbooks_dir, package='runbooks'):
+        self.package   = package
+        self.available = set(
+            name[:-3] for name in os.listdir(runbooks_dir)
+            if name.endswith('.py') and not name.startswith('_')
+        )
+        self.modules   = {}
+        self.lock      = threading.Lock()
+
+    def __contains__(self, runbook_id):
+        return runbook_id in self.available
+
+    def missing(self, runbook_ids):
+        """
+        returns sorted list of the runbook IDs without a runbook file
+        """
+
+        return sorted(set(runbook_ids) - self.available)
+
+    def get(self, runbook_id):
+        """
+        returns the runbook module, importing it on first use
+
+        Raises KeyError if the runbook doesn't exist
+        """
+
+        runbook = self.modules.get(runbook_id)
+
+        if runbook is None:
+            if runbook_id not in self.available:
+                raise KeyError('Runbook {} not found in the {} folder'.format(runbook_id, self.package))
+
+            with self.lock:
+                runbook = self.modules.get(runbook_id)
+
+                if runbook is None:
+                    runbook = import_module(self.package + '.' + runbook_id)
+                    self.modules[runbook_id] = runbook
+
+        return runbook
+
+    def preload(self, runbook_ids):
+        """
+        Import runbooks ahead of the first alert. Runbooks failing to import are reported and skipped.
+        """
+
+        for runbook_id in runbook_ids:
+            try:
+                self.get(runbook_id)
+            except Exception as e:
+                print('Cannot preload runbook {0}. Error: {1}'.format(runbook_id, str(e)))
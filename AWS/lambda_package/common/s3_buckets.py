@@ -0,0 +1,55 @@
+"""
+Bucket enumeration shared by the S3 runbooks in bulk mode.
+
+Buckets are global: they're listed once, and the region of each bucket is looked up along with
+the per-bucket check, both running concurrently over a batch of buckets.
+"""
+
+from botocore.exceptions import ClientError
+
+from common.task_graph import run_all
+
+# Number of buckets checked in parallel
+MAX_WORKERS = 8
+
+
+def list_buckets(session, region):
+    """
+    Every bucket of the account. The region is filled in by find_violations.
+    """
+
+    s3 = session.client('s3', region_name=region)
+
+    for bucket in s3.list_buckets()['Buckets']:
+        yield {'resource_id': bucket['Name'], 'region': region, 'metadata': bucket}
+
+
+def find_violations(session, resources, check):
+    """
+    Run the check of a runbook on a batch of buckets
+
+    check   : function(s3, bucket) returning True if the bucket violates the policy
+
+    returns list of the violating buckets, with their region. Buckets that can't be checked are
+    reported and skipped.
+    """
+
+    s3 = session.client('s3', region_name='us-east-1')
+
+    def evaluate(resource):
+        bucket = resource['resource_id']
+
+        try:
+            # LocationConstraint is None for us-east-1, and 'EU' for the oldest eu-west-1 buckets
+            location = s3.get_bucket_location(Bucket=bucket)['LocationConstraint']
+            region   = {None: 'us-east-1', 'EU': 'eu-west-1'}.get(location, location)
+
+            if not check(session.client('s3', region_name=region), bucket):
+                return None
+        except ClientError as e:
+            print('Cannot check S3 bucket {0}: {1}'.format(bucket, e.response['Error']['Message']))
+            return None
+
+        return dict(resource, region=region)
+
+    return [resource for resource in run_all(evaluate, list(resources), MAX_WORKERS) if resource is not None]
@@ -0,0 +1,128 @@
+"""
+Fair scheduler of the remediations of a batch.
+
+Tasks are tagged with an account, a service and a lane. The scheduler runs them on a thread pool:
+
+- accounts take turns, round-robin, so an account flooding the queue doesn't delay the alerts of
+  the other accounts until its own alerts are done
+- at most account_limit tasks of an account, and service_limit tasks of an (account, service),
+  run at the same time (0: no limit), which keeps a noisy account within its API quotas
+- the tasks of a lane run one after another, in the order they were given (tasks without a lane
+  don't wait for any other task)
+
+A task that can't start because of a limit leaves its worker to the tasks of the other accounts.
+"""
+
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+
+class Task(object):
+
+    def __init__(self, func, account=None, service=None, lane=None):
+        self.func    = func
+        self.account = account
+        self.service = service
+        self.lane    = lane
+
+
+class FairScheduler(object):
+
+    def __init__(self, max_workers=4, account_limit=0, service_limit=0):
+        self.max_workers   = max(1, max_workers)
+        self.account_limit = account_limit
+        self.service_limit = service_limit
+
+    def run(self, tasks):
+        """
+        Run the tasks
+
+        returns list of the results of the tasks, in the order of the tasks
+        """
+
+        results = [None] * len(tasks)
+
+        # Pending task indexes by account, and the accounts in turn order
+        queues = {}
+        turns = deque()
+
+        for index, task in enumerate(tasks):
+            if task.account not in queues:
+                queues[task.account] = []
+                turns.append(task.account)
+
+            queues[task.account].append(index)
+
+        running = {}
+        busy_lanes = set()
+        in_flight = {}
+
+        def can_start(task, blocked_lanes):
+            if task.lane is not None and (task.lane in busy_lanes or task.lane in blocked_lanes):
+                return False
+
+            if self.account_limit and in_flight.get(task.account, 0) >= self.account_limit:
+                return False
+
+            if self.service_limit and in_flight.get((task.account, task.service), 0) >= self.service_limit:
+                return False
+
+            return True
+
+        def next_task():
+            """
+            First task that can start, in the queue of the first account in turn that has one
+            """
+
+            for _ in range(len(turns)):
+                account = turns[0]
+                turns.rotate(-1)
+
+                # A lane whose first pending task can't start blocks its later tasks
+                blocked_lanes = set()
+
+                for position, index in enumerate(queues[account]):
+                    task = tasks[index]
+
+                    if can_start(task, blocked_lanes):
+                        del queues[account][position]
+
+                        if not queues[account]:
+                            del queues[account]
+                            turns.remove(account)
+
+                        return index
+
+                    if task.lane is not None:
+                        blocked_lanes.add(task.lane)
+
+            return None
+
+        def update(task, count):
+            if task.lane is not None and count > 0:
+                busy_lanes.add(task.lane)
+            elif task.lane is not None:
+                busy_lanes.discard(task.lane)
+
+            for key in (task.account, (task.account, task.service)):
+                in_flight[key] = in_flight.get(key, 0) + count
+
+        with ThreadPoolExecutor(max_workers=min(self.max_workers, len(tasks)) or 1) as pool:
+            while queues or running:
+                while len(running) < self.max_workers:
+                    index = next_task()
+
+                    if index is None:
+                        break
+
+                    update(tasks[index], 1)
+                    running[pool.submit(tasks[index].func)] = index
+
+                done, _ = wait(list(running), return_when=FIRST_COMPLETED)
+
+                for future in done:
+                    index = running.pop(future)
+                    update(tasks[index], -1)
+                    results[index] = future.result()
+
+        return results
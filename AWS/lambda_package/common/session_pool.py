@@ -0,0 +1,169 @@
+"""
+Pool of boto3 sessions and clients, kept across warm Lambda invocations.
+
+Building a boto3 session and its clients loads the botocore service models and resolves the
+endpoints, which costs tens of milliseconds and a few megabytes each time. The pool hands out
+one client per (account, region, service) and reuses it, along with its HTTP connection pool,
+for every alert targeting the same tuple. The least recently used clients are evicted once
+the pool reaches its maximum size.
+
+All the clients are built from a single boto3 session, with the credentials of their account
+passed to session.client, so the service models are loaded once and shared by every account
+instead of being loaded again by a session per account.
+
+botocore event handlers passed as hooks, e.g. the API call counters of common/metrics.py, are
+registered on the session, and so apply to all the clients built from it. The clients are built
+with the botocore Config passed as config (see common/retry.py), and client_hooks are functions
+returning the handlers of the client of an (account, region, service), e.g. its rate limiter.
+"""
+
+from collections import OrderedDict
+import threading
+
+import boto3
+
+
+class SessionPool(object):
+    """
+    Clients keyed by (account, region, service). Credentials are identified by their access key ID,
+    so refreshed credentials replace the clients built from the previous ones.
+    """
+
+    def __init__(self, max_clients=64, hooks=None, config=None, client_hooks=None):
+        self.max_clients = max_clients
+        self.hooks    = hooks or []
+        self.config   = config
+        self.client_hooks = client_hooks or []
+        self.shared_session = None
+        self.clients  = OrderedDict()
+        self.lock     = threading.Lock()
+        self.session_lock = threading.Lock()
+
+    def session(self, account_id, region_name, credentials=None, log=None):
+        """
+        Session handed to the runbooks. Exposes the boto3.Session interface. The clients it builds
+        are timed in the 'session' phase of log (a common.logger.RecordLog), if given.
+        """
+
+        return PooledSession(self, account_id, region_name, credentials, log)
+
+    def boto3_session(self):
+        """
+        boto3 session shared by all the accounts, along with the lock guarding it (sessions aren't
+        thread-safe)
+        """
+
+        with self.lock:
+            if self.shared_session is None:
+                session = boto3.session.Session()
+
+                for event_name, handler in self.hooks:
+                    session.events.register(event_name, handler)
+
+                self.shared_session = session
+
+        return self.shared_session, self.session_lock
+
+    def client(self, account_id, region_name, service_name, credentials=None, log=None):
+        """
+        Pooled client for (account, region, service). Building a new client is timed in the
+        'session' phase of log, if given.
+        """
+
+        access_key = credentials['AccessKeyId'] if credentials else None
+        key = (account_id, region_name, service_name)
+
+        with self.lock:
+            cached = self.clients.get(key)
+
+            if cached is not None and cached[0] == access_key:
+                self.clients.move_to_end(key)
+                return cached[1]
+
+        if log is not None:
+            with log.phase('session'):
+                client = self.new_client(account_id, region_name, service_name, credentials)
+        else:
+            client = self.new_client(account_id, region_name, service_name, credentials)
+
+        with self.lock:
+            self.clients[key] = (access_key, client)
+            self.clients.move_to_end(key)
+
+            while len(self.clients) > self.max_clients:
+                self.clients.popitem(last=False)
+
+        return client
+
+    def new_client(self, account_id, region_name, service_name, credentials=None, **kwargs):
+        """
+        Unpooled client built with the pool's config and client hooks
+        """
+
+        if self.config is not None:
+            kwargs['config'] = self.config.merge(kwargs['config']) if kwargs.get('config') else self.config
+
+        kwargs.update(credential_kwargs(credentials))
+        session, session_lock = self.boto3_session()
+
+        with session_lock:
+            client = session.client(service_name, region_name=region_name, **kwargs)
+
+        for client_hooks in self.client_hooks:
+            for event_name, handler in client_hooks(account_id, region_name, service_name):
+                client.meta.events.register(event_name, handler)
+
+        return client
+
+
+def credential_kwargs(credentials):
+    """
+    Arguments of session.client and session.resource for temporary credentials, none for the
+    Lambda's own credentials
+    """
+
+    if not credentials:
+        return {}
+
+    return {
+        'aws_access_key_id': credentials['AccessKeyId'],
+        'aws_secret_access_key': credentials['SecretAccessKey'],
+        'aws_session_token': credentials['SessionToken']
+    }
+
+
+class PooledSession(object):
+    """
+    Drop-in replacement of boto3.Session for the runbooks, backed by a SessionPool
+    """
+
+    def __init__(self, pool, account_id, region_name, credentials=None, log=None):
+        self.pool = pool
+        self.account_id  = account_id
+        self.region_name = region_name
+        self.credentials = credentials
+        self.log = log
+
+    def client(self, service_name, region_name=None, **kwargs):
+        """
+        Same signature as boto3.Session.client. Clients created with extra arguments aren't pooled.
+        """
+
+        region_name = region_name or self.region_name
+
+        if kwargs:
+            return self.pool.new_client(self.account_id, region_name, service_name, self.credentials, **kwargs)
+
+        return self.pool.client(self.account_id, region_name, service_name, self.credentials, self.log)
+
+    def resource(self, service_name, region_name=None, **kwargs):
+        kwargs.update(credential_kwargs(self.credentials))
+        session, session_lock = self.pool.boto3_session()
+
+        with session_lock:
+            return session.resource(service_name, region_name=region_name or self.region_name, **kwargs)
+
+    def __getattr__(self, name):
+        # The other attributes are those of the shared session, e.g. available_regions
+        session, _ = self.pool.boto3_session()
+        return getattr(session, name)
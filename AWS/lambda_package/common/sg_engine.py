@@ -0,0 +1,271 @@
+"""
+Security group remediation engine shared by the global admin port runbooks (AWS-EC2-002, -003,
+-004 and -010).
+
+A SecurityGroupPolicy is built once, when the runbook is imported: the admin ports are parsed into
+a sorted index per protocol and the global CIDRs into network objects. All the permissions of a
+group are then matched in a single pass, and the offending rules are revoked in batched calls.
+In bulk mode, every group of a region is listed and matched without any further API call.
+
+Besides the CIDRs listed as global, a set of ranges that together cover a global CIDR for the same
+admin port (e.g. 0.0.0.0/1 + 128.0.0.0/1) is treated as global too.
+"""
+
+from bisect import bisect_left
+import ipaddress
+
+from botocore.exceptions import ClientError
+
+# Maximum number of rules (permission + CIDR range) revoked per API call
+MAX_RULES_PER_CALL = 50
+
+# Protocol numbers returned by the API in place of the protocol names
+PROTOCOL_NAMES = {'6': 'tcp', '17': 'udp'}
+
+# Key of the ranges and of their CIDR in a permission, per IP version
+RANGE_KEYS = {4: ('IpRanges', 'CidrIp'), 6: ('Ipv6Ranges', 'CidrIpv6')}
+
+
+class SecurityGroupPolicy(object):
+    """
+    Admin ports that must not be open to the global CIDRs
+
+    admin_ports   : list of '<protocol>-<port>' strings, e.g. [ 'tcp-22', 'tcp-3389' ]
+    global_cidrs  : list of CIDRs, e.g. [ '0.0.0.0/0', '::/0' ]
+    """
+
+    def __init__(self, admin_ports, global_cidrs):
+        self.ports = {}
+
+        for admin_port in admin_ports:
+            proto, port = admin_port.lower().split('-', 1)
+            self.ports.setdefault(proto, set()).add(int(port))
+
+        self.ports = dict((proto, sorted(ports)) for proto, ports in self.ports.items())
+
+        self.global_cidrs    = set(global_cidrs)
+        self.global_networks = [ipaddress.ip_network(cidr, strict=False) for cidr in global_cidrs]
+        self.networks        = {}
+
+    def admin_ports(self, ip_protocol, from_port, to_port):
+        """
+        returns list of the admin ports within the port range, as (protocol, port) tuples
+        """
+
+        proto = PROTOCOL_NAMES.get(ip_protocol, ip_protocol).lower()
+        ports = self.ports.get(proto)
+
+        if not ports:
+            return []
+
+        index = bisect_left(ports, from_port)
+        found = []
+
+        while index < len(ports) and ports[index] <= to_port:
+            found.append((proto, ports[index]))
+            index += 1
+
+        return found
+
+    def network(self, cidr):
+        """
+        Parsed CIDR, or None if it can't be parsed. Memoized, as the same CIDRs show up in most groups.
+        """
+
+        if cidr not in self.networks:
+            try:
+                self.networks[cidr] = ipaddress.ip_network(cidr, strict=False)
+            except ValueError:
+                self.networks[cidr] = None
+
+        return self.networks[cidr]
+
+    def offending_rules(self, ip_perms):
+        """
+        Match the permissions of a security group against the policy
+
+        returns list of the rules to revoke, as (protocol, from port, to port, ranges key, CIDR key, CIDR) tuples
+        """
+
+        offending  = []
+        candidates = {}
+
+        for ip_perm in ip_perms:
+            # Permissions without a port range (e.g. all traffic) aren't covered by this policy
+            if 'FromPort' not in ip_perm:
+                continue
+
+            admin_ports = self.admin_ports(ip_perm['IpProtocol'], ip_perm['FromPort'], ip_perm['ToPort'])
+
+            if not admin_ports:
+                continue
+
+            for version, (IpRanges, IpCidr) in RANGE_KEYS.items():
+                for ip_range in ip_perm.get(IpRanges, []):
+                    cidr = ip_range[IpCidr]
+                    rule = (ip_perm['IpProtocol'], ip_perm['FromPort'], ip_perm['ToPort'], IpRanges, IpCidr, cidr)
+
+                    if cidr in self.global_cidrs:
+                        offending.append(rule)
+                        continue
+
+                    network = self.network(cidr)
+
+                    if network is None:
+                        continue
+
+                    for admin_port in admin_ports:
+                        candidates.setdefault((admin_port, version), []).append((network, rule))
+
+        for ranges in candidates.values():
+            for rule in self.covering_rules(ranges):
+                if rule not in offending:
+                    offending.append(rule)
+
+        return offending
+
+    def covering_rules(self, ranges):
+        """
+        Find the ranges open to the same admin port that together cover a global CIDR
+
+        returns list of the rules of the widest ranges (ranges nested in another one are left alone)
+        """
+
+        found = []
+
+        for global_network in self.global_networks:
+            inside = [(network, rule) for network, rule in ranges
+                      if network.version == global_network.version and contains(global_network, network)]
+
+            if not inside:
+                continue
+
+            union = ipaddress.collapse_addresses(network for network, rule in inside)
+
+            if not any(contains(network, global_network) for network in union):
+                continue
+
+            for network, rule in inside:
+                nested = any(other != network and contains(other, network) for other, _ in inside)
+
+                if not nested and rule not in found:
+                    found.append(rule)
+
+        return found
+
+    def check(self, session, alert):
+        """
+        Find the offending rules of the security group referenced in the alert
+
+        returns the remediation plan, or None if the group has no offending rule
+        """
+
+        sg_id  = alert['resource_id']
+        region = alert['region']
+
+        ec2 = session.client('ec2', region_name=region)
+
+        try:
+            group = ec2.describe_security_groups(GroupIds=[ sg_id, ])['SecurityGroups']
+        except ClientError as e:
+            print(e.response['Error']['Message'])
+            return
+
+        try:
+            ip_perms = group[0]['IpPermissions']
+        except (IndexError, KeyError):
+            print('IP permissions not found for security group {}.'.format(sg_id))
+            return
+
+        rules = self.offending_rules(ip_perms)
+
+        if not rules:
+            return
+
+        return {
+            'sg_id'   : sg_id,
+            'region'  : region,
+            'rules'   : rules,
+            'actions' : ['Revoke rule permitting {}/{:d}-{:d} with cidr {} from {}.'.format(ip_protocol, from_port, to_port, cidr_ip, sg_id)
+                         for ip_protocol, from_port, to_port, IpRanges, IpCidr, cidr_ip in rules]
+        }
+
+    def apply(self, session, plan):
+        """
+        Revoke the offending rules found by check
+        """
+
+        ec2 = session.client('ec2', region_name=plan['region'])
+
+        revoke_rules(ec2, plan['sg_id'], plan['rules'])
+
+    def list_resources(self, session, region):
+        """
+        Every security group of the region, for the bulk mode
+        """
+
+        ec2 = session.client('ec2', region_name=region)
+
+        for page in ec2.get_paginator('describe_security_groups').paginate():
+            for group in page['SecurityGroups']:
+                yield {'resource_id': group['GroupId'], 'region': region, 'metadata': group}
+
+    def find_violations(self, resources):
+        """
+        Security groups with offending rules, matched locally on their description
+        """
+
+        return [resource for resource in resources
+                if self.offending_rules(resource['metadata'].get('IpPermissions', []))]
+
+
+def contains(outer, inner):
+    """
+    Check if a network is within another one (ipaddress subnet_of is Python 3.7+)
+    """
+
+    return (outer.network_address <= inner.network_address and
+            inner.broadcast_address <= outer.broadcast_address)
+
+
+def revoke_rules(ec2, sg_id, rules):
+    """
+    Revoke Ingress Security Group Rules, batched in as few API calls as possible
+    """
+
+    for i in range(0, len(rules), MAX_RULES_PER_CALL):
+        chunk = rules[i:i + MAX_RULES_PER_CALL]
+
+        try:
+            ec2.revoke_security_group_ingress(GroupId=sg_id, IpPermissions=ip_permissions(chunk))
+        except ClientError as e:
+            print(e.response['Error']['Message'])
+
+            # The whole call fails if one of the rules can't be revoked, try them one by one
+            if len(chunk) > 1:
+                for rule in chunk:
+                    revoke_rules(ec2, sg_id, [ rule ])
+
+            continue
+
+        for ip_protocol, from_port, to_port, IpRanges, IpCidr, cidr_ip in chunk:
+            print('Revoked rule permitting {}/{:d}-{:d} with cidr {} from {}.'.format(ip_protocol, from_port, to_port, cidr_ip, sg_id))
+
+
+def ip_permissions(rules):
+    """
+    Build the IpPermissions list of a revoke call, one permission per protocol and port range
+    """
+
+    ip_perms = {}
+
+    for ip_protocol, from_port, to_port, IpRanges, IpCidr, cidr_ip in rules:
+        ip_perm = ip_perms.setdefault((ip_protocol, from_port, to_port), {
+            'IpProtocol': ip_protocol,
+            'FromPort': from_port,
+            'ToPort': to_port
+        })
+
+        ip_perm.setdefault(IpRanges, []).append({ IpCidr: cidr_ip })
+
+    return list(ip_perms.values())
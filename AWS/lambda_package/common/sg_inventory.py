@@ -0,0 +1,113 @@
+"""
+Inventory of the resources using each security group, per account and region.
+
+Checking whether a security group is unused means looking at every network interface and every
+Lambda function of the region. The inventory lists them once and builds a reverse index from
+security group ID to the resources using it, so a burst of alerts for the groups of an account
+pays for a single listing and then does dict lookups.
+
+Indexes are kept across warm invocations for SG_INVENTORY_TTL seconds (default 60), and at most
+SG_INVENTORY_SIZE (account, region) indexes are kept (default 32), evicting the oldest first.
+"""
+
+from collections import OrderedDict
+import os
+import threading
+import time
+
+
+def env_int(name, default):
+    try:
+        return max(0, int(os.getenv(name, str(default))))
+    except ValueError:
+        return default
+
+
+class SecurityGroupInventory(object):
+
+    def __init__(self, ttl=60, max_entries=32):
+        self.ttl         = ttl
+        self.max_entries = max_entries
+        self.indexes     = OrderedDict()
+        self.locks       = {}
+        self.lock        = threading.Lock()
+
+    @property
+    def enabled(self):
+        return self.ttl > 0 and self.max_entries > 0
+
+    def users(self, session, account_id, region, sg_id):
+        """
+        returns set of the resources using the security group (network interface IDs, Lambda function names)
+
+        Raises ClientError if the resources can't be listed
+        """
+
+        return self.index(session, account_id, region).get(sg_id, set())
+
+    def index(self, session, account_id, region):
+        """
+        returns dict of security group ID -> set of the resources using it, built if missing or expired
+        """
+
+        key = (account_id, region)
+
+        # One lock per (account, region), so concurrent alerts wait for a single listing
+        with self.lock:
+            key_lock = self.locks.setdefault(key, threading.Lock())
+
+        with key_lock:
+            with self.lock:
+                cached = self.indexes.get(key)
+
+            if cached is not None and time.time() - cached[0] < self.ttl:
+                return cached[1]
+
+            index = build_index(session, region)
+
+            with self.lock:
+                self.indexes[key] = (time.time(), index)
+                self.indexes.move_to_end(key)
+
+                while len(self.indexes) > self.max_entries:
+                    evicted, _ = self.indexes.popitem(last=False)
+                    self.locks.pop(evicted, None)
+
+        return index
+
+    def invalidate(self, account_id, region):
+        """
+        Drop the index of an (account, region), e.g. when it turned out to be stale
+        """
+
+        with self.lock:
+            self.indexes.pop((account_id, region), None)
+
+
+def build_index(session, region):
+    """
+    List the network interfaces and the Lambda functions of the region
+
+    returns dict of security group ID -> set of the resources using it
+    """
+
+    ec2 = session.client('ec2', region_name=region)
+    lam = session.client('lambda', region_name=region)
+
+    index = {}
+
+    for page in ec2.get_paginator('describe_network_interfaces').paginate():
+        for eni in page['NetworkInterfaces']:
+            for group in eni.get('Groups', []):
+                index.setdefault(group['GroupId'], set()).add(eni['NetworkInterfaceId'])
+
+    # Lambda functions keep their security groups after their network interfaces are released
+    for page in lam.get_paginator('list_functions').paginate():
+        for function in page['Functions']:
+            for sg_id in function.get('VpcConfig', {}).get('SecurityGroupIds', []):
+                index.setdefault(sg_id, set()).add(function['FunctionName'])
+
+    return index
+
+
+inventory = SecurityGroupInventory(env_int('SG_INVENTORY_TTL', 60), env_int('SG_INVENTORY_SIZE', 32))
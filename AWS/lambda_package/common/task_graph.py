@@ -0,0 +1,65 @@
+"""
+Minimal dependency graph executor.
+
+Runs a set of named tasks on a thread pool, starting each task as soon as the tasks it depends on
+are done. Independent tasks run concurrently. The API calls made by the tasks are attributed to
+the runbook that started them (see common/api_profile.py).
+"""
+
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+from common.api_profile import profiler
+
+
+def run_graph(tasks, dependencies=None, max_workers=4):
+    """
+    tasks         : dict of task name -> callable taking no argument
+    dependencies  : dict of task name -> list of the task names it runs after
+
+    returns dict of task name -> exception raised by the task (None if it succeeded). A task whose
+    dependency failed still runs, as each teardown step reports its own errors; the caller decides
+    what to do with the failures.
+    """
+
+    dependencies = dependencies or {}
+
+    for name, after in dependencies.items():
+        unknown = set(after) - set(tasks)
+        if name not in tasks or unknown:
+            raise ValueError('Unknown task(s) in the dependencies of {}: {}'.format(name, sorted(unknown) or name))
+
+    results = {}
+    pending = dict((name, set(dependencies.get(name, []))) for name in tasks)
+    running = {}
+
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        while pending or running:
+            ready = [name for name, after in pending.items() if not after - set(results)]
+
+            if not ready and not running:
+                raise ValueError('Circular dependencies between tasks: {}'.format(sorted(pending)))
+
+            for name in ready:
+                del pending[name]
+                running[pool.submit(profiler.bind(tasks[name]))] = name
+
+            done, _ = wait(list(running), return_when=FIRST_COMPLETED)
+
+            for future in done:
+                results[running.pop(future)] = future.exception()
+
+    return results
+
+
+def run_all(func, items, max_workers=4):
+    """
+    Call func on every item concurrently
+
+    returns list of the results, in the order of the items
+    """
+
+    if len(items) <= 1:
+        return [func(item) for item in items]
+
+    with ThreadPoolExecutor(max_workers=min(max_workers, len(items))) as pool:
+        return list(pool.map(profiler.bind(func), items))
@@ -1,9 +1,26 @@
 from __future__ import print_function
-from importlib import import_module
-from botocore.exceptions import ClientError
-import boto3
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+from functools import partial
+from common.api_profile import profiler
+from common.logger import RecordLog, log_event
+from common.metrics import metrics
+from common.runbook_registry import RunbookRegistry
+from common.task_graph import run_all
 import json
 import os
+import threading
+
+
+# boto3 and botocore are imported where they're used. Unless LAZY_IMPORTS is set to "true",
+# they're also imported here, so their loading time is paid at cold start rather than by the
+# first remediation.
+
+lazy_imports = os.getenv('LAZY_IMPORTS', 'false').strip().lower() == 'true'
+
+if not lazy_imports:
+    import boto3
+    from common.session_pool import SessionPool
 
 
 # Prisma Cloud ID to old Evident ID
@@ -53,6 +70,36 @@ runbook_lookup = {
 }
 
 
+# Runbooks found in the runbooks folder. Checked against runbook_lookup at cold start, and
+# preloaded if listed in the PRELOAD_RUNBOOKS env variable (comma separated IDs, or "all")
+
+runbook_registry = RunbookRegistry(os.path.join(os.path.dirname(os.path.abspath(__file__)), 'runbooks'))
+
+for runbook_id in runbook_registry.missing(runbook_lookup.values()):
+    log_event('WARNING', 'Runbook referenced in runbook_lookup but not found', runbook_id=runbook_id)
+
+preload_runbooks = os.getenv('PRELOAD_RUNBOOKS', '')
+
+if lazy_imports and preload_runbooks.strip():
+    log_event('WARNING', 'LAZY_IMPORTS is enabled, PRELOAD_RUNBOOKS is ignored')
+elif preload_runbooks.strip().lower() == 'all':
+    runbook_registry.preload(sorted(set(runbook_lookup.values()) & runbook_registry.available))
+elif preload_runbooks.strip():
+    runbook_registry.preload([runbook_id.strip() for runbook_id in preload_runbooks.split(',') if runbook_id.strip()])
+
+
+# Assumed role credentials keyed by account ID, the session pool, the apply semaphore and the idempotency
+# store. Kept across warm invocations.
+
+credentials_cache = {}
+credentials_locks = {}
+cache_lock        = threading.Lock()
+sts_client        = None
+session_pool      = None
+apply_slots       = None
+idempotency_store = None
+
+
 def parse_alert_message(sqs_message):
     """ 
      *** Extract Prisma Cloud SQS message ***
@@ -97,19 +144,24 @@ def parse_alert_message(sqs_message):
         if parsed_alert['region'] == 'global':
             parsed_alert['region'] = 'us-east-1'
 
-        if alert['policyId'] in runbook_lookup:
-            parsed_alert['runbook_id'] = runbook_lookup[alert['policyId']]
-            return {'error': None, 'data': parsed_alert}
-        else:
+        if alert['policyId'] not in runbook_lookup:
             return {'error': "Runbook not found", 'data': parsed_alert}
 
+        parsed_alert['runbook_id'] = runbook_lookup[alert['policyId']]
+
+        if parsed_alert['runbook_id'] not in runbook_registry:
+            return {'error': "Runbook {} not found".format(parsed_alert['runbook_id']), 'data': parsed_alert}
+
+        return {'error': None, 'data': parsed_alert}
+
     except Exception as e:
         return {'error': str(e), 'data': None}
 
 
 def get_credentials(account_id):
     """
-    Using STS assume role to obtain the temporary credentials of another AWS account
+    Using STS assume role to obtain the temporary credentials of another AWS account.
+    Credentials are cached per account and reused until they are about to expire.
 
     returns dict:
         'error'    : None if credentials is acquired successfully. Otherwise, it contains error message
@@ -120,69 +172,796 @@ def get_credentials(account_id):
             SessionToken
     """
 
+    from botocore.exceptions import ClientError
+
     cross_account_role_name = os.getenv('CROSS_ACCOUNT_ROLE_NAME', None)
 
     if cross_account_role_name == None:
         return {'error': 'Lambda env variable CROSS_ACCOUNT_ROLE_NAME not specified.', 'data': None}
 
+    # One lock per account, so records of the same account wait for a single assume_role call
+    with cache_lock:
+        account_lock = credentials_locks.setdefault(account_id, threading.Lock())
+
+    with account_lock:
+        credentials = credentials_cache.get(account_id)
+
+        if credentials is not None and not credentials_expiring(credentials):
+            return {'error': None, 'data': credentials}
+
+        try:
+            resp = get_sts_client().assume_role(
+                RoleArn = 'arn:aws:iam::{0}:role/{1}'.format(account_id, cross_account_role_name),
+                RoleSessionName = 'PrismaRemediation'
+                )
+        except ClientError as e:
+            error = 'Failed to assume role. Error code: {0}'.format(e.response['Error']['Code'])
+            return {'error': error, 'data': None}
+
+        credentials_cache[account_id] = resp['Credentials']
+
+        return {'error': None, 'data': resp['Credentials']}
+
+
+def credentials_expiring(credentials):
+    """
+    Check if cached credentials expire within the CREDENTIALS_REFRESH_MARGIN env variable (in seconds, default 300).
+    Refreshing ahead of the expiration leaves the runbook enough time to finish its calls.
+    """
+
     try:
-        resp = boto3.client('sts').assume_role(
-            RoleArn = 'arn:aws:iam::{0}:role/{1}'.format(account_id, cross_account_role_name),
-            RoleSessionName = 'PrismaRemediation'
+        margin = int(os.getenv('CREDENTIALS_REFRESH_MARGIN', '300'))
+    except ValueError:
+        margin = 300
+
+    return credentials['Expiration'] - timedelta(seconds=margin) <= datetime.now(timezone.utc)
+
+
+def get_sts_client():
+    """
+    STS client shared by all the assume_role calls
+    """
+
+    import boto3
+    from common import retry
+
+    global sts_client
+
+    with cache_lock:
+        if sts_client is None:
+            # Not the default boto3 session, which isn't thread-safe
+            sts_client = boto3.session.Session().client('sts', config=retry.client_config())
+
+    return sts_client
+
+
+def get_session_pool():
+    """
+    Pool of the sessions and clients handed to the runbooks, reused across warm invocations.
+    Its size is set by the CLIENT_POOL_SIZE env variable (default 64 clients). The API calls
+    of its clients are counted in the metrics and recorded in the API call profile, and follow
+    the retry policy and rate limit of common/retry.py.
+    """
+
+    from common import retry
+    from common.session_pool import SessionPool
+
+    global session_pool
+
+    with cache_lock:
+        if session_pool is None:
+            try:
+                max_clients = max(1, int(os.getenv('CLIENT_POOL_SIZE', '64')))
+            except ValueError:
+                max_clients = 64
+
+            limiter = retry.rate_limiter_from_env()
+
+            session_pool = SessionPool(
+                max_clients,
+                hooks = metrics.api_hooks() + profiler.api_hooks(),
+                config = retry.client_config(),
+                client_hooks = [ limiter.client_hooks ] if limiter else []
             )
 
-        return {'error': None, 'data': resp['Credentials']}
-    except ClientError as e:
-        error = 'Failed to assume role. Error code: {0}'.format(e.response['Error']['Code'])
-        return {'error': error, 'data': None}
+    return session_pool
 
 
-def lambda_handler(event, context):
+def get_apply_slots():
     """
-    Entry point which is invoked by Lambda
+    Semaphore bounding the number of apply phases run at the same time, from the APPLY_CONCURRENCY
+    env variable. None (the default, 0) leaves them bounded by the worker threads only.
     """
 
-    print("#### Received {} record(s) ####".format(len(event['Records'])))
+    global apply_slots
 
-    for record in event['Records']:
-        parsed_alert = parse_alert_message(record['body'])
+    with cache_lock:
+        if apply_slots is None:
+            try:
+                slots = max(0, int(os.getenv('APPLY_CONCURRENCY', '0')))
+            except ValueError:
+                slots = 0
 
-        if parsed_alert['data'] == 'P-0':
-            print(parsed_alert['error'])
-        else:
-            
-            if parsed_alert['error'] is not None:
-                print('Error in SQS record. Raw message:', record)
-                raise Exception(parsed_alert['error'])
-            else:
-                parsed_alert = parsed_alert['data']
+            apply_slots = threading.BoundedSemaphore(slots) if slots else False
+
+    return apply_slots or None
+
+
+def get_idempotency_store():
+    """
+    Store of the alerts already remediated (see common/idempotency.py), None if disabled
+    """
+
+    from common import idempotency
 
-            # Check to see if the remediation runbook exists 
+    global idempotency_store
+
+    with cache_lock:
+        if idempotency_store is None:
             try:
-                runbook = import_module('runbooks.' + parsed_alert['runbook_id'])
+                idempotency_store = idempotency.from_env() or False
             except Exception as e:
-                message = 'Cannot import/find runbook for {0} ({1}). Error: {2}'.format(parsed_alert['runbook_id'], parsed_alert['policy_id'], str(e))
-                raise Exception(message)
+                log_event('WARNING', 'Idempotency store disabled', error=str(e))
+                idempotency_store = False
+
+    return idempotency_store or None
+
+
+def pending_records(store, group):
+    """
+    Drop the records of a group whose alert was already remediated. Store errors are reported,
+    and the record is then processed.
+
+    returns list of the remaining (record, parsed_alert) tuples
+    """
+
+    from common.idempotency import alert_key
+
+    pending = []
+
+    for record, parsed_alert in group:
+        if parsed_alert['error'] is None:
+            alert = parsed_alert['data']
+
+            try:
+                done = store.is_done(alert_key(alert))
+            except Exception as e:
+                log_event('WARNING', 'Idempotency store error', error=str(e))
+                done = False
+
+            if done:
+                parsed_alert['log'].emit('skipped')
+                continue
+
+        pending.append((record, parsed_alert))
+
+    return pending
+
+
+def mark_done(store, group):
+    """
+    Record the alerts of a group as remediated
+    """
+
+    from common.idempotency import alert_key
+
+    for record, parsed_alert in group:
+        if parsed_alert['error'] is not None:
+            continue
+
+        try:
+            store.mark_done(alert_key(parsed_alert['data']))
+        except Exception as e:
+            log_event('WARNING', 'Idempotency store error', error=str(e))
+
+
+def is_dry_run(runbook):
+    """
+    Dry-run mode, set for every runbook by the DRY_RUN env variable or for a single one by its dry_run option
+    """
+
+    return os.getenv('DRY_RUN', 'false').strip().lower() == 'true' or getattr(runbook, 'dry_run', False) is True
+
+
+def run_runbook(runbook, session, alert, context, log=None):
+    """
+    Run the check phase of a runbook, then its apply phase unless in dry-run mode. The check phase
+    only reads, the apply phase makes the changes described by the plan the check returned.
+
+    Runbooks without a check phase are run with remediate(session, alert, context), and skipped in dry-run mode.
+
+    The outcome ('remediated', 'compliant' or 'dry_run'), the planned actions and the phase timings are
+    recorded in the log.
+
+    returns the plan, or None if there was nothing to remediate
+    """
+
+    log = log or RecordLog()
+
+    if not hasattr(runbook, 'check'):
+        if is_dry_run(runbook):
+            log.set(outcome='dry_run', actions=[])
+        else:
+            with log.phase('apply'):
+                runbook.remediate(session, alert, context)
+            log.set(outcome='remediated')
+        return None
+
+    with log.phase('check'):
+        plan = runbook.check(session, alert, context)
+
+    if not plan:
+        log.set(outcome='compliant')
+        return None
+
+    log.set(actions=plan['actions'])
+
+    if is_dry_run(runbook):
+        log.set(outcome='dry_run')
+        return plan
+
+    slots = get_apply_slots()
+
+    if slots:
+        slots.acquire()
+
+    try:
+        with log.phase('apply'):
+            runbook.apply(session, plan, context)
+    finally:
+        if slots:
+            slots.release()
+
+    log.set(outcome='remediated')
+
+    return plan
+
+
+def get_max_workers():
+    """
+    Number of worker threads used to process a batch, from the REMEDIATION_WORKERS env variable.
+    A value of 1 (the default) processes the records one after another.
+    """
+
+    try:
+        return max(1, int(os.getenv('REMEDIATION_WORKERS', '1')))
+    except ValueError:
+        return 1
+
+
+def coalesce_records(records):
+    """
+    Parse the SQS records and group the alerts targeting the same resource with the same runbook,
+    i.e. the same (account, region, runbook ID, resource ID). The runbook is run once per group.
+
+    Coalescing can be turned off by setting the COALESCE_ALERTS env variable to "false". Records
+    that can't be parsed, and test notifications, always get a group of their own.
+
+    returns list of groups in the order they were received, each group being a list of
+    (record, parsed_alert) tuples. parsed_alert['log'] is the RecordLog of the record.
+    """
+
+    coalesce = os.getenv('COALESCE_ALERTS', 'true').strip().lower() != 'false'
+    groups = {}
+
+    for index, record in enumerate(records):
+        log = RecordLog(message_id=record['messageId'])
+
+        with log.phase('parse'):
+            parsed_alert = parse_alert_message(record['body'])
+
+        parsed_alert['log'] = log
+
+        if parsed_alert['error'] is None:
+            log.set_alert(parsed_alert['data'])
+
+        if coalesce and parsed_alert['error'] is None:
+            alert = parsed_alert['data']
+            key = (alert['account']['account_number'], alert['region'], alert['runbook_id'], alert['resource_id'])
+        else:
+            key = ('record', index)
+
+        groups.setdefault(key, []).append((record, parsed_alert))
+
+    return list(groups.values())
+
+
+def runbook_service(runbook_id):
+    """
+    AWS service of a runbook, from its ID (e.g. AWS-EC2-002: ec2). The SSS runbooks use s3 and the
+    VPC runbooks use ec2.
+    """
+
+    category = runbook_id.split('-')[-2].lower()
+
+    return {'sss': 's3', 'vpc': 'ec2'}.get(category, category)
+
+
+def get_scheduler():
+    """
+    Scheduler of the groups of a batch, with REMEDIATION_WORKERS worker threads. At most
+    ACCOUNT_CONCURRENCY groups of an account, and SERVICE_CONCURRENCY groups of an (account, service),
+    run at the same time (0, the default: no limit).
+    """
+
+    from common.scheduler import FairScheduler
+
+    limits = {}
+
+    for env_name in ('ACCOUNT_CONCURRENCY', 'SERVICE_CONCURRENCY'):
+        try:
+            limits[env_name] = max(0, int(os.getenv(env_name, '0')))
+        except ValueError:
+            limits[env_name] = 0
+
+    return FairScheduler(get_max_workers(), limits['ACCOUNT_CONCURRENCY'], limits['SERVICE_CONCURRENCY'])
+
+
+def build_tasks(groups, context):
+    """
+    Scheduler tasks of the alert groups, tagged with their account and runbook service. Groups of
+    the same (account, region, resource) share a lane, so they are processed in the order they were
+    received. Records that can't be parsed are scheduled on their own.
+
+    returns list of Task, in the order of the groups
+    """
+
+    from common.scheduler import Task
+
+    tasks = []
+
+    for group in groups:
+        parsed_alert = group[0][1]
+        func = partial(run_group, group, context)
+
+        if parsed_alert['error'] is None:
+            alert = parsed_alert['data']
+            account_id = alert['account']['account_number']
+            lane = (account_id, alert['region'], alert['resource_id'])
+
+            tasks.append(Task(func, account_id, runbook_service(alert['runbook_id']), lane))
+        else:
+            tasks.append(Task(func))
+
+    return tasks
+
+
+def run_group(group, context):
+    """
+    Process a group of coalesced records, by running the runbook once for the first alert of the
+    group. Any error is reported instead of raised, and applies to every record of the group.
 
-            # If the resource is on another account, get the temporary credentials
-            self_account_id = context.invoked_function_arn.split(":")[4]
-            if parsed_alert['account']['account_number'] == self_account_id:
-                session = boto3.Session(region_name = parsed_alert['region'])
+    Alerts already remediated, e.g. on redelivery, are skipped before any credentials are fetched.
+
+    returns list of the messageIds of the records that failed
+    """
+
+    store = get_idempotency_store()
+
+    if store is not None:
+        group = pending_records(store, group)
+
+        if not group:
+            return []
+
+    record, parsed_alert = group[0]
+    log = parsed_alert['log']
+
+    try:
+        process_record(record, parsed_alert, context)
+    except Exception as e:
+        log.emit('failed', str(e))
+        put_record_metrics(log, failed=True)
+
+        for item in group[1:]:
+            item[1]['log'].emit('failed', str(e))
+
+        return [item[0]['messageId'] for item in group]
+
+    log.emit()
+    put_record_metrics(log)
+
+    # The other alerts of the group were remediated by the same run
+    for item in group[1:]:
+        item[1]['log'].set(coalesced_into=record['messageId'])
+        item[1]['log'].emit('coalesced')
+
+    # Only remediated alerts are skipped on redelivery: a compliant outcome may come from a check
+    # that couldn't read the resource, and dry-run or test alerts weren't remediated
+    if store is not None and log.fields.get('outcome') == 'remediated':
+        mark_done(store, group)
+
+    return []
+
+
+def put_record_metrics(log, failed=False):
+    """
+    Count a runbook run in the metrics, with its latency: the time spent in all its phases
+    """
+
+    if log.fields.get('outcome') == 'test':
+        return
+
+    runbook_id = log.fields.get('runbook_id', 'unknown')
+
+    metrics.put('Records', 1, RunbookId=runbook_id)
+    metrics.put('Succeeded', 0 if failed else 1, RunbookId=runbook_id)
+    metrics.put('Failed', 1 if failed else 0, RunbookId=runbook_id)
+    metrics.put('Latency', round(sum(log.timings.values()), 2), 'Milliseconds', RunbookId=runbook_id)
+
+
+def get_session(account_id, region, context, log=None):
+    """
+    Session for an account and region. If the account isn't the Lambda's own account,
+    the temporary credentials of the cross account role are used.
+
+    Raises an exception if the credentials can't be obtained
+    """
+
+    log = log or RecordLog()
+
+    self_account_id = context.invoked_function_arn.split(":")[4]
+
+    # The clients built by the runbooks are timed in the 'session' phase
+    if account_id == self_account_id:
+        return get_session_pool().session(self_account_id, region, log=log)
+
+    with log.phase('credentials'):
+        credentials = get_credentials(account_id)
+
+    if credentials['error'] is not None:
+        raise Exception(credentials['error'])
+
+    return get_session_pool().session(account_id, region, credentials['data'], log)
+
+
+def process_record(record, parsed_alert, context):
+    """
+    Remediate a single SQS record. Raises an exception if the record can't be remediated.
+    """
+
+    log = parsed_alert['log']
+
+    if parsed_alert['data'] == 'P-0':
+        log.set(outcome='test', error=parsed_alert['error'])
+        return
+
+    if parsed_alert['error'] is not None:
+        # The raw message is only logged at the DEBUG level
+        log_event('DEBUG', 'Error in SQS record', message_id=record['messageId'], body=record['body'])
+        raise Exception(parsed_alert['error'])
+    else:
+        parsed_alert = parsed_alert['data']
+
+    # Check to see if the remediation runbook exists 
+    try:
+        with log.phase('import'):
+            runbook = runbook_registry.get(parsed_alert['runbook_id'])
+    except Exception as e:
+        message = 'Cannot import/find runbook for {0} ({1}). Error: {2}'.format(parsed_alert['runbook_id'], parsed_alert['alert_id'], str(e))
+        raise Exception(message)
+
+    session = get_session(parsed_alert['account']['account_number'], parsed_alert['region'], context, log)
+
+    # Finally, execute the runbook. Its API calls are attributed to it in the API call profile.
+    with profiler.attribute(parsed_alert['runbook_id']):
+        run_runbook(runbook, session, parsed_alert, context, log)
+
+
+def home_region():
+    """
+    Region of the Lambda function, used for the account-level API calls
+    """
+
+    return os.getenv('AWS_REGION', 'us-east-1')
+
+
+def get_concurrency(event, env_name, default=4):
+    """
+    Concurrency of the sweep and bulk modes, from the event or from an env variable
+    """
+
+    try:
+        return max(1, int(event.get('concurrency') or os.getenv(env_name, str(default))))
+    except ValueError:
+        return default
+
+
+def get_enabled_regions(session):
+    """
+    returns sorted list of the regions enabled in the account of the session
+    """
+
+    regions = session.client('ec2').describe_regions()['Regions']
+
+    return sorted(region['RegionName'] for region in regions)
+
+
+def sweep_region(runbook, alert_template, region, context):
+    """
+    Run a region-scoped runbook in a region. Runbooks with a sweep_resources(session, region) function
+    are run once per resource it returns, the others once for the region.
+
+    returns dict:
+        'status'    : 'remediated' or 'failed'
+        'resources' : list of the resource IDs the runbook has been run for
+        'error'     : error message, if the region failed
+    """
+
+    resources = []
+
+    with profiler.attribute(alert_template['runbook_id']):
+        try:
+            session = get_session(alert_template['account']['account_number'], region, context)
+
+            if hasattr(runbook, 'sweep_resources'):
+                resource_ids = runbook.sweep_resources(session, region)
             else:
-                credentials = get_credentials(parsed_alert['account']['account_number'])
-                if credentials['error'] is None:
-                    session = boto3.Session(
-                        region_name = parsed_alert['region'],
-                        aws_access_key_id = credentials['data']['AccessKeyId'],
-                        aws_secret_access_key = credentials['data']['SecretAccessKey'],
-                        aws_session_token = credentials['data']['SessionToken']
-                        )
-                else:
-                    raise Exception(credentials['error'])
-                
-            # Finally, execute the runbook
-            print('Remediation for Prisma Cloud alert: ', parsed_alert['alert_id'])
-            print('Alert detail: ', parsed_alert)
-            print('Executing runbook; ', parsed_alert['runbook_id'], '...')
-
-            runbook.remediate(session, parsed_alert, context)
+                resource_ids = [ None ]
+
+            for resource_id in resource_ids:
+                alert = dict(alert_template, region=region, resource_id=resource_id)
+                alert['alert_id'] = 'sweep-{0}-{1}'.format(region, resource_id or alert['runbook_id'])
+
+                log = RecordLog(mode='sweep')
+                log.set_alert(alert)
+
+                try:
+                    run_runbook(runbook, session, alert, context, log)
+                except Exception as e:
+                    log.emit('failed', str(e))
+                    put_record_metrics(log, failed=True)
+                    raise
+
+                log.emit()
+                put_record_metrics(log)
+                resources.append(resource_id)
+
+        except Exception as e:
+            log_event('ERROR', 'Sweep failed', runbook_id=alert_template['runbook_id'], region=region, error=str(e))
+            return {'status': 'failed', 'resources': resources, 'error': str(e)}
+
+    return {'status': 'remediated', 'resources': resources}
+
+
+def sweep_handler(event, context):
+    """
+    Sweep mode: run a region-scoped runbook across all the enabled regions of an account,
+    instead of waiting for one alert per region.
+
+    event dict:
+        'mode'          : 'sweep'
+        'runbook_id'    : runbook to run, it must set region_scoped = True
+        'account_id'    : target account (default: the Lambda's own account)
+        'regions'       : list of regions (default: every region enabled in the account)
+        'concurrency'   : number of regions swept in parallel (default: SWEEP_CONCURRENCY env variable, or 4)
+
+    returns dict:
+        'runbook_id', 'account_id'
+        'regions'       : {region: result of sweep_region}
+        'failed'        : number of regions that failed
+        'dry_run'       : True if the changes were only planned (see run_runbook)
+    """
+
+    runbook_id = event['runbook_id']
+    account_id = event.get('account_id') or context.invoked_function_arn.split(":")[4]
+
+    runbook = runbook_registry.get(runbook_id)
+
+    if getattr(runbook, 'region_scoped', False) != True:
+        raise Exception('Runbook {} is not region-scoped and cannot be swept.'.format(runbook_id))
+
+    regions = event.get('regions') or get_enabled_regions(get_session(account_id, home_region(), context))
+    concurrency = get_concurrency(event, 'SWEEP_CONCURRENCY')
+
+    log_event('INFO', 'Sweep started', runbook_id=runbook_id, account_id=account_id, regions=regions)
+
+    alert_template = {
+        'runbook_id' : runbook_id,
+        'account'    : {'name': event.get('account_name', account_id), 'account_number': account_id},
+        'metadata'   : {}
+    }
+
+    with ThreadPoolExecutor(max_workers=min(concurrency, len(regions))) as pool:
+        results = list(pool.map(lambda region: sweep_region(runbook, alert_template, region, context), regions))
+
+    summary = {
+        'runbook_id' : runbook_id,
+        'account_id' : account_id,
+        'regions'    : dict(zip(regions, results)),
+        'failed'     : len([result for result in results if result['status'] == 'failed']),
+        'dry_run'    : is_dry_run(runbook)
+    }
+
+    log_event('INFO', 'Sweep summary', **summary)
+
+    return summary
+
+
+def bulk_region(runbook, alert_template, region, batch_size, concurrency, context):
+    """
+    Bulk-remediate a region: list the resources, find the violations batch by batch and
+    remediate only the violating resources.
+
+    returns dict:
+        'scanned'     : number of resources listed
+        'violations'  : number of resources violating the policy
+        'remediated'  : number of resources remediated
+        'failed'      : number of resources the runbook failed on
+        'error'       : error message, if the region couldn't be processed
+    """
+
+    result  = {'scanned': 0, 'violations': 0, 'remediated': 0, 'failed': 0}
+    account_id = alert_template['account']['account_number']
+
+    def remediate(resource):
+        alert = dict(alert_template, region=resource['region'], resource_id=resource['resource_id'], metadata=resource.get('metadata', {}))
+        alert['alert_id'] = 'bulk-{0}'.format(resource['resource_id'])
+
+        log = RecordLog(mode='bulk')
+        log.set_alert(alert)
+
+        try:
+            run_runbook(runbook, get_session(account_id, resource['region'], context, log), alert, context, log)
+        except Exception as e:
+            log.emit('failed', str(e))
+            put_record_metrics(log, failed=True)
+            return False
+
+        log.emit()
+        put_record_metrics(log)
+
+        return True
+
+    def process_batch(session, batch):
+        violations = runbook.find_violations(session, batch)
+        outcomes = run_all(remediate, violations, concurrency)
+
+        result['scanned']    += len(batch)
+        result['violations'] += len(violations)
+        result['remediated'] += outcomes.count(True)
+        result['failed']     += outcomes.count(False)
+
+    with profiler.attribute(alert_template['runbook_id']):
+        try:
+            session = get_session(account_id, region, context)
+            batch = []
+
+            for resource in runbook.list_resources(session, region):
+                batch.append(resource)
+
+                if len(batch) >= batch_size:
+                    process_batch(session, batch)
+                    batch = []
+
+            if batch:
+                process_batch(session, batch)
+
+        except Exception as e:
+            log_event('ERROR', 'Bulk remediation failed', runbook_id=alert_template['runbook_id'], region=region, error=str(e))
+            result['error'] = str(e)
+
+    return result
+
+
+def bulk_handler(event, context):
+    """
+    Bulk mode: remediate every violating resource of an account, instead of waiting for one alert
+    per resource. The runbook must define list_resources(session, region), which enumerates the
+    candidate resources, and find_violations(session, resources), which evaluates a batch of them.
+    Runbooks setting bulk_scope = 'global' (e.g. S3 buckets) list their resources once.
+
+    event dict:
+        'mode'          : 'bulk'
+        'runbook_id'    : runbook to run
+        'account_id'    : target account (default: the Lambda's own account)
+        'regions'       : list of regions (default: every region enabled in the account)
+        'batch_size'    : number of resources evaluated at once (default: BULK_BATCH_SIZE env variable, or 100)
+        'concurrency'   : number of regions, and of resources per region, processed in parallel
+                          (default: BULK_CONCURRENCY env variable, or 4)
+
+    returns dict:
+        'runbook_id', 'account_id'
+        'regions'       : {region: result of bulk_region}
+        'remediated'    : total number of resources remediated
+        'failed'        : total number of resources or regions that failed
+        'dry_run'       : True if the changes were only planned (see run_runbook)
+    """
+
+    runbook_id = event['runbook_id']
+    account_id = event.get('account_id') or context.invoked_function_arn.split(":")[4]
+
+    runbook = runbook_registry.get(runbook_id)
+
+    if not hasattr(runbook, 'list_resources') or not hasattr(runbook, 'find_violations'):
+        raise Exception('Runbook {} does not support the bulk mode.'.format(runbook_id))
+
+    if getattr(runbook, 'bulk_scope', 'region') == 'global':
+        regions = [ home_region() ]
+    else:
+        regions = event.get('regions') or get_enabled_regions(get_session(account_id, home_region(), context))
+
+    concurrency = get_concurrency(event, 'BULK_CONCURRENCY')
+
+    try:
+        batch_size = max(1, int(event.get('batch_size') or os.getenv('BULK_BATCH_SIZE', '100')))
+    except ValueError:
+        batch_size = 100
+
+    log_event('INFO', 'Bulk remediation started', runbook_id=runbook_id, account_id=account_id, regions=regions)
+
+    alert_template = {
+        'runbook_id' : runbook_id,
+        'account'    : {'name': event.get('account_name', account_id), 'account_number': account_id}
+    }
+
+    with ThreadPoolExecutor(max_workers=min(concurrency, len(regions))) as pool:
+        results = list(pool.map(lambda region: bulk_region(runbook, alert_template, region, batch_size, concurrency, context), regions))
+
+    summary = {
+        'runbook_id' : runbook_id,
+        'account_id' : account_id,
+        'regions'    : dict(zip(regions, results)),
+        'remediated' : sum(result['remediated'] for result in results),
+        'failed'     : sum(result['failed'] + (1 if 'error' in result else 0) for result in results),
+        'dry_run'    : is_dry_run(runbook)
+    }
+
+    log_event('INFO', 'Bulk summary', **summary)
+
+    return summary
+
+
+def lambda_handler(event, context):
+    """
+    Entry point which is invoked by Lambda. SQS batches are remediated (see sqs_handler); a direct
+    invocation with {'mode': 'sweep', ...} or {'mode': 'bulk', ...} runs the sweep mode (see
+    sweep_handler) or the bulk mode (see bulk_handler).
+
+    The API call profile of the invocation is logged, and the metrics buffered during the
+    invocation are flushed to stdout, before returning.
+    """
+
+    try:
+        if 'Records' not in event and event.get('mode') == 'sweep':
+            return sweep_handler(event, context)
+
+        if 'Records' not in event and event.get('mode') == 'bulk':
+            return bulk_handler(event, context)
+
+        return sqs_handler(event, context)
+
+    finally:
+        log_event('INFO', 'API call profile', runbooks=profiler.take())
+        metrics.flush()
+
+
+def sqs_handler(event, context):
+    """
+    Remediate a batch of SQS records
+
+    returns dict:
+        'batchItemFailures' : list of {'itemIdentifier': messageId} for the records to redeliver
+    """
+
+    records = event['Records']
+
+    log_event('INFO', 'Received records', count=len(records))
+    metrics.put('BatchSize', len(records))
+
+    groups = coalesce_records(records)
+    failures = []
+
+    if len(groups) <= 1:
+        for group in groups:
+            failures.extend(run_group(group, context))
+    else:
+        # Accounts take turns, so a storm of alerts from one account doesn't hold back the others
+        for group_failures in get_scheduler().run(build_tasks(groups, context)):
+            failures.extend(group_failures)
+
+    if failures:
+        log_event('WARNING', 'Records failed and will be redelivered', count=len(failures))
+
+    # Only the failed records are returned to the queue, the others are deleted by SQS
+    return {'batchItemFailures': [{'itemIdentifier': message_id} for message_id in failures]}
@@ -32,13 +32,12 @@ Sample IAM Policy:
 }
 """
 
-import boto3
 from botocore.exceptions import ClientError
 
 
-def remediate(session, alert, lambda_context):
+def check(session, alert, lambda_context):
   """
-  Main Function invoked by index_prisma.py
+  Check phase invoked by index_prisma.py, returns the remediation plan or None
   """
 
   stack_id = alert['resource_id']
@@ -59,7 +58,23 @@ def remediate(session, alert, lambda_context):
     return
 
   if stack[0]['EnableTerminationProtection'] != True:
-    result = enable_term_protection(cfn, stack_name)
+    return {
+      'stack_name' : stack_name,
+      'region'     : region,
+      'actions'    : [ 'Enable termination protection for CloudFormation Stack {}.'.format(stack_name) ]
+    }
+
+  return
+
+
+def apply(session, plan, lambda_context):
+  """
+  Apply phase invoked by index_prisma.py
+  """
+
+  cfn = session.client('cloudformation', region_name=plan['region'])
+
+  result = enable_term_protection(cfn, plan['stack_name'])
 
   return
 
@@ -53,13 +53,12 @@ Sample IAM Policy:
 """
 
 import json
-import boto3
 from botocore.exceptions import ClientError
 
 
-def remediate(session, alert, lambda_context):
+def check(session, alert, lambda_context):
   """
-  Main Function invoked by index_prisma.py
+  Check phase invoked by index_prisma.py, returns the remediation plan or None
   """
 
   trail_name = alert['resource_id']
@@ -125,10 +124,30 @@ def remediate(session, alert, lambda_context):
     if not bucket_region: bucket_region = 'us-east-1'     # N. Virginia
     if bucket_region == 'EU': bucket_region = 'eu-west-1' # Ireland
 
-    key_id = create_cmk(session, account_id, trail_name, bucket_region)
+    return {
+      'trail_name'    : trail_name,
+      'region'        : region,
+      'account_id'    : account_id,
+      'bucket_region' : bucket_region,
+      'actions'       : [ 'Create a KMS Customer Managed Key in {} and update Trail {} with it.'.format(bucket_region, trail_name) ]
+    }
+
+  return
+
+
+def apply(session, plan, lambda_context):
+  """
+  Apply phase invoked by index_prisma.py
+  """
+
+  trail_name = plan['trail_name']
+
+  clt = session.client('cloudtrail', region_name=plan['region'])
+
+  key_id = create_cmk(session, plan['account_id'], trail_name, plan['bucket_region'])
 
-    if key_id != 'fail':
-      update_trail_cmk(clt, trail_name, key_id)
+  if key_id != 'fail':
+    update_trail_cmk(clt, trail_name, key_id)
 
   return
 
@@ -17,6 +17,7 @@ Required Permissions:
 - logs:CreateLogGroup
 - logs:DescribeLogGroups
 - logs:PutRetentionPolicy
+- cloudtrail:DescribeTrails
 - cloudtrail:UpdateTrail
 
 Sample IAM Policy:
@@ -47,6 +48,7 @@ Sample IAM Policy:
     {
       "Sid": "CloudTrailPermissions",
       "Action": [
+        "cloudtrail:DescribeTrails",
         "cloudtrail:UpdateTrail"
       ],
       "Effect": "Allow",
@@ -57,9 +59,8 @@ Sample IAM Policy:
 """
 
 import json
-import boto3
 from botocore.exceptions import ClientError
-from time import sleep
+from common.iam_ready import retry_on_propagation, wait_for_role
 
 # Options:
 #
@@ -70,14 +71,46 @@ policy_name = 'CWLogsAllowDeliveryPolicy'
 log_group_name = 'CloudTrail/DefaultLogGroup'
 
 
-def remediate(session, alert, lambda_context):
+def check(session, alert, lambda_context):
   """
-  Main Function invoked by index_prisma.py
+  Check phase invoked by index_prisma.py, returns the remediation plan or None
   """
 
   trail_name = alert['resource_id']
   region     = alert['region']
 
+  clt = session.client('cloudtrail', region_name=region)
+
+  try:
+    trail = clt.describe_trails(trailNameList=[ trail_name ], includeShadowTrails=False)['trailList']
+  except ClientError as e:
+    print(e.response['Error']['Message'])
+    return
+
+  if not trail:
+    print('Error: Unable to find Trail {}.'.format(trail_name))
+    return
+
+  # Already integrated with CloudWatch Logs
+  if trail[0].get('CloudWatchLogsLogGroupArn'):
+    return
+
+  return {
+    'trail_name' : trail_name,
+    'region'     : region,
+    'actions'    : [ 'Create or update IAM Role {} and CloudWatch Logs group {}.'.format(role_name, log_group_name),
+                     'Integrate Trail {} with CloudWatch Logs group {}.'.format(trail_name, log_group_name) ]
+  }
+
+
+def apply(session, plan, lambda_context):
+  """
+  Apply phase invoked by index_prisma.py
+  """
+
+  trail_name = plan['trail_name']
+  region     = plan['region']
+
   iam  = session.client('iam', region_name=region)
   logs = session.client('logs', region_name=region)
   clt  = session.client('cloudtrail', region_name=region)
@@ -114,6 +147,7 @@ def new_iam_role(iam):
     role_arn  = role['Role']['Arn']
 
     print('New IAM Role created: {}'.format(role_arn))
+    wait_for_role(iam, role_name)
 
   except ClientError as e:
     if e.response['Error']['Code'] == 'EntityAlreadyExists':
@@ -138,8 +172,6 @@ def new_iam_role(iam):
     print(e.response['Error']['Message'])
     return 'fail'
 
-  sleep(10)  # Wait for IAM resource to be available. >> Gotta be a better way.. { wait? get? }.
-
   return role_arn
 
 
@@ -188,7 +220,10 @@ def update_trail(clt, trail_name, log_group_arn, role_arn):
   """
 
   try:
-    result = clt.update_trail(
+    # CloudTrail rejects the role until the new role and its policy have propagated
+    result = retry_on_propagation(
+      clt.update_trail,
+      [ 'InvalidCloudWatchLogsRoleArnException', 'InvalidCloudWatchLogsLogGroupArnException' ],
       Name = trail_name,
       CloudWatchLogsLogGroupArn = log_group_arn,
       CloudWatchLogsRoleArn = role_arn,
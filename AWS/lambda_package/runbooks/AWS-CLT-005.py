@@ -34,13 +34,12 @@ Sample IAM Policy:
 }
 """
 
-import boto3
 from botocore.exceptions import ClientError
 
 
-def remediate(session, alert, lambda_context):
+def check(session, alert, lambda_context):
   """
-  Main Function invoked by index_prisma.py
+  Check phase invoked by index_prisma.py, returns the remediation plan or None
   """
 
   trail_name  = alert['resource_id']
@@ -55,7 +54,23 @@ def remediate(session, alert, lambda_context):
     return
 
   if trail[0]['LogFileValidationEnabled'] != True:
-    result = enable_validation(clt, trail_name)
+    return {
+      'trail_name' : trail_name,
+      'region'     : region,
+      'actions'    : [ 'Enable log file validation for Trail {}.'.format(trail_name) ]
+    }
+
+  return
+
+
+def apply(session, plan, lambda_context):
+  """
+  Apply phase invoked by index_prisma.py
+  """
+
+  clt = session.client('cloudtrail', region_name=plan['region'])
+
+  result = enable_validation(clt, plan['trail_name'])
 
   return
 
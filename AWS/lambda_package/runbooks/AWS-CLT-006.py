@@ -32,13 +32,12 @@ Sample IAM Policy:
 }
 """
 
-import boto3
 from botocore.exceptions import ClientError
 
 
-def remediate(session, alert, lambda_context):
+def check(session, alert, lambda_context):
   """
-  Main Function invoked by index_prisma.py
+  Check phase invoked by index_prisma.py, returns the remediation plan or None
   """
 
   bucket_name = alert['resource_id']
@@ -74,13 +73,29 @@ def remediate(session, alert, lambda_context):
 
   new_bucket_acl['Grants'] = new_grants
 
-  # Remediate
   if public == True:
-    result = remove_public_acl(s3, bucket_name, new_bucket_acl)
+    return {
+      'bucket_name'    : bucket_name,
+      'region'         : region,
+      'new_bucket_acl' : new_bucket_acl,
+      'actions'        : [ 'Remove the public ACL policy of CloudTrail S3 bucket {}.'.format(bucket_name) ]
+    }
     
   return
 
 
+def apply(session, plan, lambda_context):
+  """
+  Apply phase invoked by index_prisma.py
+  """
+
+  s3  = session.client('s3', region_name=plan['region'])
+
+  result = remove_public_acl(s3, plan['bucket_name'], plan['new_bucket_acl'])
+
+  return
+
+
 def remove_public_acl(s3, bucket_name, new_bucket_acl):
   """
   Remove S3 Bucket Public ACL Policy
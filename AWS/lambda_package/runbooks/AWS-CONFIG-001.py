@@ -17,6 +17,8 @@ Required Permissions:
 - iam:GetRole
 - s3:CreateBucket
 - s3:PutBucketPolicy
+- config:DescribeConfigurationRecorderStatus
+- config:DescribeDeliveryChannels
 - config:PutConfigurationRecorder
 - config:PutDeliveryChannel
 - config:StartConfigurationRecorder
@@ -48,6 +50,8 @@ Sample IAM Policy:
     {
       "Sid": "ConfigPermissions",
       "Action": [
+        "config:DescribeConfigurationRecorderStatus",
+        "config:DescribeDeliveryChannels",
         "config:PutConfigurationRecorder",
         "config:PutDeliveryChannel",
         "config:StartConfigurationRecorder"
@@ -60,18 +64,51 @@ Sample IAM Policy:
 """
 
 import json
-import boto3
 from botocore.exceptions import ClientError
-from time import sleep
+from common.iam_ready import retry_on_propagation, wait_for_role
 
+# Options:
+#
+# Region-scoped runbook, which can be run across all the regions of an account (sweep mode).
+# Regions where AWS Config is already recording are left untouched by the check.
+#
+region_scoped = True
 
-def remediate(session, alert, lambda_context):
+
+def check(session, alert, lambda_context):
   """
-  Main Function invoked by index_prisma.py
+  Check phase invoked by index_prisma.py, returns the remediation plan or None
   """
 
   region = alert['region']
 
+  config = session.client('config', region_name=region)
+
+  try:
+    recorders = config.describe_configuration_recorder_status()['ConfigurationRecordersStatus']
+    channels  = config.describe_delivery_channels()['DeliveryChannels']
+  except ClientError as e:
+    print(e.response['Error']['Message'])
+    return
+
+  # AWS Config is enabled if a recorder is recording and delivers to a channel
+  if channels and any(recorder.get('recording') for recorder in recorders):
+    return
+
+  return {
+    'region'  : region,
+    'actions' : [ 'Create or update IAM Role {}, the Config Recorder, S3 bucket and Delivery Channel.'.format('config-role-' + region),
+                  'Enable AWS Config in region {}.'.format(region) ]
+  }
+
+
+def apply(session, plan, lambda_context):
+  """
+  Apply phase invoked by index_prisma.py
+  """
+
+  region = plan['region']
+
   iam  = session.client('iam', region_name=region)
   s3   = session.client('s3', region_name=region)
   config = session.client('config', region_name=region)
@@ -116,7 +153,7 @@ def new_iam_role(iam, region):
     role_arn = role['Role']['Arn']
 
     print('New IAM Role created: {}'.format(role_arn))
-    sleep(10)  # Wait for IAM resource to be available. >> Gotta be a better way.. { wait? get? }.
+    wait_for_role(iam, role_name)
 
   except ClientError as e:
     if e.response['Error']['Code'] == 'EntityAlreadyExists':
@@ -196,7 +233,10 @@ def new_config_recorder(config, role_arn):
   recorder_name = 'default'
 
   try:
-    result = config.put_configuration_recorder(
+    # A new role can take a few seconds to be usable by Config
+    result = retry_on_propagation(
+      config.put_configuration_recorder,
+      [ 'InvalidRoleException' ],
       ConfigurationRecorder = {
         'name': recorder_name,
         'roleARN': role_arn,
@@ -223,7 +263,9 @@ def new_config_channel(config, bucket_name):
   channel_name = 'default'
 
   try:
-    result = config.put_delivery_channel(
+    result = retry_on_propagation(
+      config.put_delivery_channel,
+      [ 'InsufficientDeliveryPolicyException' ],
       DeliveryChannel = {
         'name': channel_name,
         's3BucketName': bucket_name,
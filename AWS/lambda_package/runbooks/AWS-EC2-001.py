@@ -37,7 +37,6 @@ Sample IAM Policy:
 }
 """
 
-import boto3
 from botocore.exceptions import ClientError
 from datetime import datetime
 from datetime import date
@@ -49,9 +48,9 @@ from datetime import date
 snapshot_age = 15
 
 
-def remediate(session, alert, lambda_context):
+def check(session, alert, lambda_context):
   """
-  Main Function invoked by index_prisma.py
+  Check phase invoked by index_prisma.py, returns the remediation plan or None
   """
 
   volume_id = alert['resource_id']
@@ -75,11 +74,27 @@ def remediate(session, alert, lambda_context):
     snapshot_needed = True
 
   if snapshot_needed == True:
-    response = new_ebs_snapshot(ec2, volume_id)
+    return {
+      'volume_id' : volume_id,
+      'region'    : region,
+      'actions'   : [ 'Create a new snapshot of EBS Volume {}.'.format(volume_id) ]
+    }
     
   return
 
 
+def apply(session, plan, lambda_context):
+  """
+  Apply phase invoked by index_prisma.py
+  """
+
+  ec2 = session.client('ec2', region_name=plan['region'])
+
+  response = new_ebs_snapshot(ec2, plan['volume_id'])
+
+  return
+
+
 def new_ebs_snapshot(ec2, volume_id):
   """
   Create a new EBS Volume Snapshot
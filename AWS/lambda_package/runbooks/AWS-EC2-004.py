@@ -8,7 +8,8 @@ Description:
 Global permission to access the well-known services TCP port 3389 (RDP) should not be allowed in a
 security group.
 
-**Note: Remediation will be executed if the well-known service is found within a port range.
+**Note: Remediation will be executed if the well-known service is found within a port range, or if
+several ranges together open it to the internet (e.g. 0.0.0.0/1 and 128.0.0.0/1).
 
 Required Permissions:
 
@@ -35,10 +36,7 @@ Sample IAM Policy:
 }
 """
 
-import json
-import re
-import boto3
-from botocore.exceptions import ClientError
+from common.sg_engine import SecurityGroupPolicy
 
 # Options:
 #
@@ -48,90 +46,39 @@ from botocore.exceptions import ClientError
 admin_port_list  = [ 'tcp-3389' ]
 global_cidr_list = [ '0.0.0.0/0', '::/0' ]
 
+# Ports and CIDRs are parsed once, when the runbook is imported
+policy = SecurityGroupPolicy(admin_port_list, global_cidr_list)
 
-def remediate(session, alert, lambda_context):
+
+def check(session, alert, lambda_context):
   """
-  Main Function invoked by index_prisma.py
+  Check phase invoked by index_prisma.py, returns the remediation plan or None
   """
 
-  sg_id  = alert['resource_id']
-  region = alert['region']
-
-  ec2   = session.client('ec2', region_name=region)
-
-  try:
-    group = ec2.describe_security_groups(GroupIds=[ sg_id, ])['SecurityGroups']
-  except ClientError as e:
-    print(e.response['Error']['Message'])
-    return
-
-  try:
-    ip_perms = group[0]['IpPermissions']
-  except (IndexError, KeyError):
-    print('IP permissions not found for security group {}.'.format(sg_id))
-    return
-
-  for ip_perm in ip_perms:
-    try:
-      from_port   = ip_perm['FromPort']
-    except KeyError:
-      continue
-    else:
-      to_port     = ip_perm['ToPort']
-      ip_protocol = ip_perm['IpProtocol']
-
-    # Look for IPv4 permissions
-    if ip_perm['IpRanges']:
-      IpRanges = 'IpRanges'
-      IpCidr   = 'CidrIp'
-
-      for ip_range in ip_perm['IpRanges']:
-        cidr_ip = ip_range['CidrIp']
-        remove_sg_rule(ec2, sg_id, from_port, to_port, ip_protocol, cidr_ip, IpRanges, IpCidr)
-
-    # Look for IPv6 permissions
-    if ip_perm['Ipv6Ranges']:
-      IpRanges = 'Ipv6Ranges'
-      IpCidr   = 'CidrIpv6'
-
-      for ip_range in ip_perm['Ipv6Ranges']:
-        cidr_ip = ip_range['CidrIpv6']
-        remove_sg_rule(ec2, sg_id, from_port, to_port, ip_protocol, cidr_ip, IpRanges, IpCidr)
-
-  return
+  return policy.check(session, alert)
 
 
-def remove_sg_rule(ec2, sg_id, from_port, to_port, ip_protocol, cidr_ip, IpRanges, IpCidr):
+def apply(session, plan, lambda_context):
   """
-  Revoke Ingress Security Group Rule
+  Apply phase invoked by index_prisma.py
   """
 
-  for admin_port in admin_port_list:
-    proto = re.split('-', admin_port)[0]
-    port  = re.split('-', admin_port)[1]
+  policy.apply(session, plan)
 
-    find_port='true' if from_port <= int(port) <= to_port else 'false'
+  return
 
-    if cidr_ip in global_cidr_list and ip_protocol.lower() == proto and find_port == 'true':
 
-      revoke_args = {
-        'GroupId' :  sg_id,
-        'IpPermissions' : [
-          {
-            'IpProtocol': ip_protocol,
-            'FromPort': from_port,
-            'ToPort': to_port,
-             IpRanges: [{ IpCidr: cidr_ip }]
-          }
-        ]
-      }
+def list_resources(session, region):
+  """
+  Security groups of the region, invoked by index_prisma.py in bulk mode
+  """
 
-      try:
-        ec2.revoke_security_group_ingress(**revoke_args)
+  return policy.list_resources(session, region)
 
-        print('Revoked rule permitting {}/{:d}-{:d} with cidr {} from {}.'.format(ip_protocol, from_port, to_port, cidr_ip, sg_id))
 
-      except ClientError as e:
-        print(e.response['Error']['Message'])
+def find_violations(session, resources):
+  """
+  Security groups with global admin port access, invoked by index_prisma.py in bulk mode
+  """
 
-  return
+  return policy.find_violations(resources)
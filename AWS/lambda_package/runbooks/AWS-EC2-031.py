@@ -12,6 +12,7 @@ use of them, creating open attack surfaces in your infrastructure.
 Required Permissions:
 
 - ec2:DeleteSecurityGroup
+- ec2:DescribeNetworkInterfaces
 - ec2:DescribeSecurityGroups
 - lambda:ListFunctions
 
@@ -25,6 +26,7 @@ Sample IAM Policy:
             "Effect": "Allow",
             "Action": [
                 "ec2:DeleteSecurityGroup",
+                "ec2:DescribeNetworkInterfaces",
                 "ec2:DescribeSecurityGroups",
                 "lambda:ListFunctions"
             ],
@@ -36,52 +38,86 @@ Sample IAM Policy:
 }
 """
 
-import boto3
 from botocore.exceptions import ClientError
+from common.sg_inventory import inventory
 
 
-def remediate(session, alert, lambda_context):
+def check(session, alert, lambda_context):
   """
-  Main Function invoked by index_prisma.py
+  Check phase invoked by index_prisma.py, returns the remediation plan or None
   """
 
-  sg_id  = alert['resource_id']
-  region = alert['region']
+  sg_id      = alert['resource_id']
+  region     = alert['region']
+  account_id = alert['account']['account_number']
 
   ec2 = session.client('ec2', region_name=region)
   lam = session.client('lambda', region_name=region)
 
-  # Check to see if the security group is tied to a Lambda function
+  # Check to see if the security group is in use. Bursts of alerts for the same account and region
+  # share a cached inventory of the resources using each security group.
   try:
-    functions = lam.list_functions()['Functions']
+    if inventory.enabled:
+      users = inventory.users(session, account_id, region, sg_id)
+    else:
+      users = sg_users(ec2, lam, sg_id)
   except ClientError as e:
     print(e.response['Error']['Message'])
     return
 
-  check = False
+  if users:
+    print('Security group {} is used by {}. No remediation performed.'.format(sg_id, ', '.join(sorted(users))))
+    return
 
-  for function in functions:
-    if check == True:
-      print('Security group {} is tied to a Lambda function. No remediation performed.'.format(sg_id))
-      return
+  return {
+    'sg_id'      : sg_id,
+    'region'     : region,
+    'account_id' : account_id,
+    'actions'    : [ 'Remove unused security group {}.'.format(sg_id) ]
+  }
 
-    try:
-      vpc_config = function['VpcConfig']
-    except KeyError:
-      continue
-    else:
-      security_groups = vpc_config['SecurityGroupIds']
 
-      for group in security_groups:
-        if group == sg_id:
-          check = True
+def apply(session, plan, lambda_context):
+  """
+  Apply phase invoked by index_prisma.py
+  """
 
-  # Remediate (security group is not tied to a Lambda function)
-  result = delete_unused_sg(ec2, sg_id)
+  ec2 = session.client('ec2', region_name=plan['region'])
+
+  # Remediate (security group is not in use)
+  result = delete_unused_sg(ec2, plan['sg_id'])
+
+  # Something started using the group since the inventory was built
+  if result == 'in use':
+    inventory.invalidate(plan['account_id'], plan['region'])
 
   return
 
 
+def sg_users(ec2, lam, sg_id):
+  """
+  Find the resources using the security group, without the inventory
+  """
+
+  # Network interfaces of instances, load balancers, databases, Lambda functions.. The filter is
+  # applied after paging, so a page can be empty and still have a next page. Go through the pages
+  # and stop at the first match.
+  paginator = ec2.get_paginator('describe_network_interfaces')
+
+  for page in paginator.paginate(Filters=[ { 'Name': 'group-id', 'Values': [ sg_id ] } ]):
+    if page['NetworkInterfaces']:
+      return set(eni['NetworkInterfaceId'] for eni in page['NetworkInterfaces'])
+
+  # Lambda functions keep their security groups after their network interfaces are released.
+  # Go through every page of functions and stop at the first match.
+  for page in lam.get_paginator('list_functions').paginate():
+    for function in page['Functions']:
+      if sg_id in function.get('VpcConfig', {}).get('SecurityGroupIds', []):
+        return set([ function['FunctionName'] ])
+
+  return set()
+
+
 def delete_unused_sg(ec2, sg_id):
   """
   Delete Unused Security Group
@@ -91,6 +127,11 @@ def delete_unused_sg(ec2, sg_id):
     result = ec2.delete_security_group(GroupId=sg_id)
   except ClientError as e:
     print(e.response['Error']['Message'])
+
+    if e.response['Error']['Code'] == 'DependencyViolation':
+      return 'in use'
+
+    return 'fail'
   else:
     print('Removed unused security group {}.'.format(sg_id))
 
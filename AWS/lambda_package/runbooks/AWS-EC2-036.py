@@ -30,13 +30,12 @@ Sample IAM Policy:
 }
 """
 
-import boto3
 from botocore.exceptions import ClientError
 
 
-def remediate(session, alert, lambda_context):
+def check(session, alert, lambda_context):
   """
-  Main Function invoked by index_prisma.py
+  Check phase invoked by index_prisma.py, returns the remediation plan or None
   """
 
   image_id = alert['resource_id']
@@ -53,7 +52,23 @@ def remediate(session, alert, lambda_context):
 
   # Check for 'Public' permissions
   if launch_permissions == [{'Group': 'all'}]:
-    response = set_ami_to_private(ec2, image_id)
+    return {
+      'image_id' : image_id,
+      'region'   : region,
+      'actions'  : [ 'Remove "Public" LaunchPermission from AMI {}.'.format(image_id) ]
+    }
+
+  return
+
+
+def apply(session, plan, lambda_context):
+  """
+  Apply phase invoked by index_prisma.py
+  """
+
+  ec2  = session.client('ec2', region_name=plan['region'])
+
+  response = set_ami_to_private(ec2, plan['image_id'])
 
   return
 
@@ -41,13 +41,12 @@ Sample IAM Policy:
 }
 """
 
-import boto3
 from botocore.exceptions import ClientError
 
 
-def remediate(session, alert, lambda_context):
+def check(session, alert, lambda_context):
   """
-  Main Function invoked by index_prisma.py
+  Check phase invoked by index_prisma.py, returns the remediation plan or None
   """
 
   sg_id  = alert['resource_id']
@@ -70,18 +69,40 @@ def remediate(session, alert, lambda_context):
   try:
     ingress_perms = group[0]['IpPermissions']
   except (IndexError, KeyError):
-    ingress_perms = ''
-
-  for ip_perm in ingress_perms:
-    remove_sg_rule(ec2, sg_id, ip_perm, revoke='ingress')
+    ingress_perms = []
 
   # Revoke all egress permissions
   try:
     egress_perms = group[0]['IpPermissionsEgress']
   except (IndexError, KeyError):
-    egress_perms = ''
+    egress_perms = []
+
+  if not ingress_perms and not egress_perms:
+    return
+
+  return {
+    'sg_id'         : sg_id,
+    'region'        : region,
+    'ingress_perms' : ingress_perms,
+    'egress_perms'  : egress_perms,
+    'actions'       : [ 'Revoke ingress rule {} from default security group {}.'.format(ip_perm, sg_id) for ip_perm in ingress_perms ] +
+                      [ 'Revoke egress rule {} from default security group {}.'.format(ip_perm, sg_id) for ip_perm in egress_perms ]
+  }
+
+
+def apply(session, plan, lambda_context):
+  """
+  Apply phase invoked by index_prisma.py
+  """
+
+  sg_id = plan['sg_id']
+
+  ec2 = session.client('ec2', region_name=plan['region'])
+
+  for ip_perm in plan['ingress_perms']:
+    remove_sg_rule(ec2, sg_id, ip_perm, revoke='ingress')
 
-  for ip_perm in egress_perms:
+  for ip_perm in plan['egress_perms']:
     remove_sg_rule(ec2, sg_id, ip_perm, revoke='egress')
 
   return
@@ -33,7 +33,6 @@ Sample IAM Policy:
 }
 """
 
-import boto3
 from botocore.exceptions import ClientError
 
 # Options:
@@ -41,9 +40,9 @@ from botocore.exceptions import ClientError
 global_cidr_list = [ '0.0.0.0/0', '::/0' ]
 
 
-def remediate(session, alert, lambda_context):
+def check(session, alert, lambda_context):
   """
-  Main Function invoked by index_prisma.py
+  Check phase invoked by index_prisma.py, returns the remediation plan or None
   """
 
   sg_id  = alert['resource_id']
@@ -63,8 +62,30 @@ def remediate(session, alert, lambda_context):
     print('IP permissions not found for security group {}.'.format(sg_id))
     return
 
+  revokes = []
+
   for ip_perm in ip_perms:
-    result = remove_offending_sg_rules(ec2, sg_id, ip_perm)
+    revokes.extend(offending_sg_rules(sg_id, ip_perm))
+
+  if revokes:
+    return {
+      'region'  : region,
+      'revokes' : revokes,
+      'actions' : [ 'Revoke security group rule: {}.'.format(revoke_args) for revoke_args in revokes ]
+    }
+
+  return
+
+
+def apply(session, plan, lambda_context):
+  """
+  Apply phase invoked by index_prisma.py
+  """
+
+  ec2   = session.client('ec2', region_name=plan['region'])
+
+  for revoke_args in plan['revokes']:
+    result = remove_sg_rule(ec2, revoke_args)
 
   return
 
@@ -86,11 +107,13 @@ def remove_sg_rule(ec2, revoke_args):
   return
 
 
-def remove_offending_sg_rules(ec2, sg_id, ip_perm):
+def offending_sg_rules(sg_id, ip_perm):
   """
-  Remove offending security group rules (calls >> remove_sg_rule())
+  Find the offending security group rules, returns list of remove_sg_rule() arguments
   """
 
+  revokes = []
+
   # Look for IPv4 permissions
   if ip_perm['IpRanges']:
 
@@ -124,7 +147,7 @@ def remove_offending_sg_rules(ec2, sg_id, ip_perm):
           revoke_args = None
 
         if revoke_args != None:
-          result = remove_sg_rule(ec2, revoke_args)
+          revokes.append(revoke_args)
 
   # Look for IPv6 permissions
   if ip_perm['Ipv6Ranges']:
@@ -159,7 +182,7 @@ def remove_offending_sg_rules(ec2, sg_id, ip_perm):
           revoke_args = None
 
         if revoke_args != None:
-          result = remove_sg_rule(ec2, revoke_args)
+          revokes.append(revoke_args)
 
-  return
+  return revokes
 
@@ -11,6 +11,7 @@ all AWS accounts.
 Required Permissions:
 
 - ec2:DescribeSnapshotAttribute
+- ec2:DescribeSnapshots (bulk mode)
 - ec2:ModifySnapshotAttribute
 
 Sample IAM Policy:
@@ -22,6 +23,7 @@ Sample IAM Policy:
       "Sid": "EC2Permissions",
       "Action": [
         "ec2:DescribeSnapshotAttribute",
+        "ec2:DescribeSnapshots",
         "ec2:ModifySnapshotAttribute"
       ],
       "Effect": "Allow",
@@ -31,13 +33,12 @@ Sample IAM Policy:
 }
 """
 
-import boto3
 from botocore.exceptions import ClientError
 
 
-def remediate(session, alert, lambda_context):
+def check(session, alert, lambda_context):
   """
-  Main Function invoked by index_prisma.py
+  Check phase invoked by index_prisma.py, returns the remediation plan or None
   """
 
   snapshot_id = alert['resource_id']
@@ -66,11 +67,49 @@ def remediate(session, alert, lambda_context):
       continue
 
   if public == True:
-    result = remove_pub_snapshot_attrib(ec2, snapshot_id) 
+    return {
+      'snapshot_id' : snapshot_id,
+      'region'      : region,
+      'actions'     : [ 'Remove "Public" attribute from EBS snapshot {}.'.format(snapshot_id) ]
+    }
 
   return
 
 
+def apply(session, plan, lambda_context):
+  """
+  Apply phase invoked by index_prisma.py
+  """
+
+  ec2 = session.client('ec2', region_name=plan['region'])
+
+  result = remove_pub_snapshot_attrib(ec2, plan['snapshot_id']) 
+
+  return
+
+
+def list_resources(session, region):
+  """
+  Public snapshots of the account in the region, invoked by index_prisma.py in bulk mode
+  """
+
+  ec2 = session.client('ec2', region_name=region)
+
+  paginator = ec2.get_paginator('describe_snapshots')
+
+  for page in paginator.paginate(OwnerIds=[ 'self' ], RestorableByUserIds=[ 'all' ]):
+    for snapshot in page['Snapshots']:
+      yield {'resource_id': snapshot['SnapshotId'], 'region': region, 'metadata': snapshot}
+
+
+def find_violations(session, resources):
+  """
+  Invoked by index_prisma.py in bulk mode. The listing only returns public snapshots.
+  """
+
+  return list(resources)
+
+
 def remove_pub_snapshot_attrib(ec2, snapshot_id):
   """
   Remove Public Snaphot Attribute
@@ -36,13 +36,12 @@ Sample IAM Policy:
 }
 """
 
-import boto3
 from botocore.exceptions import ClientError
 
 
-def remediate(session, alert, lambda_context):
+def check(session, alert, lambda_context):
   """
-  Main Function invoked by index_prisma.py
+  Check phase invoked by index_prisma.py, returns the remediation plan or None
   """
 
   arn      = alert['resource_id']
@@ -60,7 +59,23 @@ def remediate(session, alert, lambda_context):
   draining = attribs['ConnectionDraining']
 
   if draining['Enabled'] != True:
-    result = enable_conn_draining(elb, elb_name)
+    return {
+      'elb_name' : elb_name,
+      'region'   : region,
+      'actions'  : [ 'Enable Connection Draining for ELB {}.'.format(elb_name) ]
+    }
+
+  return
+
+
+def apply(session, plan, lambda_context):
+  """
+  Apply phase invoked by index_prisma.py
+  """
+
+  elb = session.client('elb', region_name=plan['region'])
+
+  result = enable_conn_draining(elb, plan['elb_name'])
 
   return
 
@@ -33,13 +33,12 @@ Sample IAM Policy:
 }
 """
 
-import boto3
 from botocore.exceptions import ClientError
 
 
-def remediate(session, alert, lambda_context):
+def check(session, alert, lambda_context):
   """
-  Main Function invoked by index_prisma.py
+  Check phase invoked by index_prisma.py, returns the remediation plan or None
   """
 
   arn      = alert['resource_id']
@@ -57,7 +56,23 @@ def remediate(session, alert, lambda_context):
   cross_zone = attribs['CrossZoneLoadBalancing']
 
   if cross_zone['Enabled'] != True:
-    result = enable_cross_zone(elb, elb_name)
+    return {
+      'elb_name' : elb_name,
+      'region'   : region,
+      'actions'  : [ 'Enable Cross-Zone Load Balancing for ELB {}.'.format(elb_name) ]
+    }
+
+  return
+
+
+def apply(session, plan, lambda_context):
+  """
+  Apply phase invoked by index_prisma.py
+  """
+
+  elb = session.client('elb', region_name=plan['region'])
+
+  result = enable_cross_zone(elb, plan['elb_name'])
 
   return
 
@@ -54,13 +54,12 @@ Sample IAM Policy:
 """
 
 import json
-import boto3
 from botocore.exceptions import ClientError
 
 
-def remediate(session, alert, lambda_context):
+def check(session, alert, lambda_context):
   """
-  Main Function invoked by index_prisma.py
+  Check phase invoked by index_prisma.py, returns the remediation plan or None
   """
 
   arn      = alert['resource_id']
@@ -68,7 +67,6 @@ def remediate(session, alert, lambda_context):
   region   = alert['region']
 
   elb = session.client('elb', region_name=region)
-  s3  = session.client('s3', region_name=region)
   sts = session.client('sts', region_name=region)
 
   try:
@@ -82,10 +80,33 @@ def remediate(session, alert, lambda_context):
   if logging['Enabled'] != True:
 
     account_id  = get_account_id(sts)
-    bucket_name = new_s3_bucket(s3, elb_name, account_id, region) if (account_id != 'fail') else 'fail'
 
-    if bucket_name != 'fail':
-      result = enable_access_log(elb, elb_name, bucket_name, region)
+    if account_id != 'fail':
+      return {
+        'elb_name'   : elb_name,
+        'region'     : region,
+        'account_id' : account_id,
+        'actions'    : [ 'Enable Access Log for ELB {} to S3 bucket {}.'.format(elb_name, 'elblogs-' + account_id + '-' + region) ]
+      }
+
+  return
+
+
+def apply(session, plan, lambda_context):
+  """
+  Apply phase invoked by index_prisma.py
+  """
+
+  elb_name = plan['elb_name']
+  region   = plan['region']
+
+  elb = session.client('elb', region_name=region)
+  s3  = session.client('s3', region_name=region)
+
+  bucket_name = new_s3_bucket(s3, elb_name, plan['account_id'], region)
+
+  if bucket_name != 'fail':
+    result = enable_access_log(elb, elb_name, bucket_name, region)
 
   return
 
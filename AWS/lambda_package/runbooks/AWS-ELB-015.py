@@ -47,13 +47,12 @@ Sample IAM Policy:
 """
 
 import json
-import boto3
 from botocore.exceptions import ClientError
 
 
-def remediate(session, alert, lambda_context):
+def check(session, alert, lambda_context):
   """
-  Main Function invoked by index_prisma.py
+  Check phase invoked by index_prisma.py, returns the remediation plan or None
   """
 
   arn      = alert['resource_id']
@@ -61,7 +60,6 @@ def remediate(session, alert, lambda_context):
   region   = alert['region']
 
   elbv2 = session.client('elbv2', region_name=region)
-  s3 = session.client('s3', region_name=region)
 
   try:
     elb = elbv2.describe_load_balancers(Names=[ elb_name ])['LoadBalancers']
@@ -91,11 +89,32 @@ def remediate(session, alert, lambda_context):
       logging = attrib['Value']
 
   if logging != 'true':
+    return {
+      'elb_name'   : elb_name,
+      'elb_arn'    : elb_arn,
+      'region'     : region,
+      'account_id' : account_id,
+      'actions'    : [ 'Enable Access Log for Application ELB {} to S3 bucket {}.'.format(elb_name, 'elbv2logs-' + account_id + '-' + region) ]
+    }
+
+  return
+
+
+def apply(session, plan, lambda_context):
+  """
+  Apply phase invoked by index_prisma.py
+  """
+
+  elb_name = plan['elb_name']
+  region   = plan['region']
+
+  elbv2 = session.client('elbv2', region_name=region)
+  s3 = session.client('s3', region_name=region)
 
-    bucket_name = new_s3_bucket(s3, elb_name, account_id, region)
+  bucket_name = new_s3_bucket(s3, elb_name, plan['account_id'], region)
 
-    if bucket_name != 'fail':
-      result = enable_access_log(elbv2, elb_arn, elb_name, bucket_name, region)
+  if bucket_name != 'fail':
+    result = enable_access_log(elbv2, plan['elb_arn'], elb_name, bucket_name, region)
 
   return
 
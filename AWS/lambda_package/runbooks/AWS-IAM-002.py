@@ -39,11 +39,11 @@ Sample IAM Policy:
 
 """
 
-# If set to True, no change will be made to password policy.
-# If set to False, password policy will be changed
+# If set to True, no change will be made to password policy, whatever the DRY_RUN env variable is.
+# If set to False, password policy will be changed, unless DRY_RUN is set
 dry_run = True
 
-def remediate(session, alert, lambda_context):
+def check(session, alert, lambda_context):
     enforced_policy = {
         'MinimumPasswordLength': 14,
         'MaxPasswordAge': 90,
@@ -70,20 +70,22 @@ def remediate(session, alert, lambda_context):
     else:
         current_policy = {}
 
+    print("current password policy: ", current_policy)
 
+    return {
+        'enforced_policy': enforced_policy,
+        'actions': ['Update account password policy with: {}'.format(enforced_policy)]
+    }
+
+
+def apply(session, plan, lambda_context):
     iam_client = session.client('iam')
     try:
-        print("current password policy: ", current_policy)
-        print('Updating account password policy with: ', enforced_policy)
-
-        if dry_run:
-            print('Dry run mode. No changes made')
-            return
-        else:
-            resp = iam_client.update_account_password_policy(**enforced_policy)
+        print('Updating account password policy with: ', plan['enforced_policy'])
+        resp = iam_client.update_account_password_policy(**plan['enforced_policy'])
 
     except Exception as e:
         raise e
     
     print('Password policy updated')
-    return 
+    return
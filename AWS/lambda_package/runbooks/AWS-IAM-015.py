@@ -31,15 +31,14 @@ Sample IAM Policy:
 }
 """
 
-import boto3
 from botocore.exceptions import ClientError
 from datetime import datetime
 from datetime import date
 
 
-def remediate(session, alert, lambda_context):
+def check(session, alert, lambda_context):
   """
-  Main Function invoked by index_prisma.py
+  Check phase invoked by index_prisma.py, returns the remediation plan or None
   """
 
   key_id = alert['resource_id']
@@ -60,7 +59,24 @@ def remediate(session, alert, lambda_context):
   delta = today - last_used
 
   if delta.days >= 90:
-    result = deactivate_access_key(iam, key_id, user_name) 
+    return {
+      'key_id'    : key_id,
+      'user_name' : user_name,
+      'region'    : region,
+      'actions'   : [ 'Deactivate access key {} for user {}.'.format(key_id, user_name) ]
+    }
+
+  return
+
+
+def apply(session, plan, lambda_context):
+  """
+  Apply phase invoked by index_prisma.py
+  """
+
+  iam = session.client('iam', region_name=plan['region'])
+
+  result = deactivate_access_key(iam, plan['key_id'], plan['user_name']) 
 
   return
 
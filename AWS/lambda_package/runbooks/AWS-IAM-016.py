@@ -1,4 +1,3 @@
-import boto3
 
 """
 Remediate Prisma Policy:
@@ -13,6 +12,8 @@ If administrator access grant is needed, use the default AdministratorAccess pol
 Required permissions:
 
 - iam:CreatePolicyVersion
+- iam:GetPolicy
+- iam:GetPolicyVersion
 
 Sample IAM Policy:
 
@@ -23,7 +24,9 @@ Sample IAM Policy:
       "Sid": "Stmt1507759700000",
       "Effect": "Allow",
       "Action": [
-        "iam:CreatePolicyVersion"
+        "iam:CreatePolicyVersion",
+        "iam:GetPolicy",
+        "iam:GetPolicyVersion"
       ],
       "Resource": [
         "*"
@@ -50,15 +53,42 @@ Remediation result:
 
 """
 
-def remediate(session, alert, lambda_context):
+import json
+from botocore.exceptions import ClientError
+from urllib.parse import unquote
+
+
+def check(session, alert, lambda_context):
 
     resource_id = alert['resource_id']
 
+    client = session.client('iam')
+
+    try:
+        version_id = client.get_policy(PolicyArn = resource_id)['Policy']['DefaultVersionId']
+        document = client.get_policy_version(PolicyArn = resource_id, VersionId = version_id)['PolicyVersion']['Document']
+    except ClientError as e:
+        print(e.response['Error']['Message'])
+        return
+
+    if not grants_admin(document):
+        return
+
+    return {
+        'policy_arn': resource_id,
+        'actions': ['Set a new default version of policy {} allowing sts:GetCallerIdentity only'.format(resource_id)]
+    }
+
+
+def apply(session, plan, lambda_context):
+
+    resource_id = plan['policy_arn']
+
     new_policy = "{\n    \"Version\": \"2012-10-17\",\n    \"Statement\": [\n        {\n            \"Sid\": \"VisualEditor0\",\n            \"Effect\": \"Allow\",\n            \"Action\": [\n                \"sts:getCallerIdentity\"\n            ],\n            \"Resource\": \"*\"\n        }\n    ]\n}"
 
     client = session.client('iam')
 
-    print('Modifying policy: {}'.format(alert['resource_id']))
+    print('Modifying policy: {}'.format(resource_id))
     
     try:
         resp = client.create_policy_version(
@@ -71,3 +101,30 @@ def remediate(session, alert, lambda_context):
         raise e
     
     return 0
+
+
+def grants_admin(document):
+    """
+    Check if a policy document allows every action on every resource
+    """
+
+    if not isinstance(document, dict):
+        document = json.loads(unquote(document))
+
+    statements = document.get('Statement', [])
+
+    if isinstance(statements, dict):
+        statements = [statements]
+
+    for statement in statements:
+        actions = statement.get('Action', [])
+        resources = statement.get('Resource', [])
+
+        if statement.get('Effect') == 'Allow' and '*' in as_list(actions) and '*' in as_list(resources):
+            return True
+
+    return False
+
+
+def as_list(value):
+    return value if isinstance(value, list) else [value]
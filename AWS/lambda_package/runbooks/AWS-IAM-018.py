@@ -14,6 +14,7 @@ Required Permissions:
 - iam:CreateRole
 - iam:CreateUser
 - iam:GetPolicy
+- iam:GetUser
 
 Sample IAM Policy:
 
@@ -26,7 +27,8 @@ Sample IAM Policy:
         "iam:AttachRolePolicy",
         "iam:CreateRole",
         "iam:CreateUser",
-        "iam:GetPolicy"
+        "iam:GetPolicy",
+        "iam:GetUser"
       ],
       "Effect": "Allow",
       "Resource": "*"
@@ -36,9 +38,8 @@ Sample IAM Policy:
 """
 
 import json
-import boto3
 from botocore.exceptions import ClientError
-from time import sleep
+from common.iam_ready import retry_on_propagation, wait_for_user
 
 # Options:
 #
@@ -49,9 +50,9 @@ support_user_name  = 'AWSSupportUser'
 support_policy_arn = 'arn:aws:iam::aws:policy/AWSSupportAccess'
 
 
-def remediate(session, alert, lambda_context):
+def check(session, alert, lambda_context):
   """
-  Main Function invoked by index_prisma.py
+  Check phase invoked by index_prisma.py, returns the remediation plan or None
   """
 
   region = alert['region']
@@ -62,24 +63,39 @@ def remediate(session, alert, lambda_context):
     policy = iam.get_policy(PolicyArn = support_policy_arn)['Policy']
   except ClientError as e:
     print(e.response['Error']['Message'])
-    return 'fail'
+    return
 
   if policy['AttachmentCount'] <= 0:
+    return {
+      'region'  : region,
+      'actions' : [ 'Create IAM User {}.'.format(support_user_name),
+                    'Create IAM Role {} and attach {}.'.format(support_role_name, support_policy_arn) ]
+    }
+
+  else:
+    print('AWS Support policy has one or more attachments: {}'.format(support_policy_arn))
+
+  return
+
+
+def apply(session, plan, lambda_context):
+  """
+  Apply phase invoked by index_prisma.py
+  """
 
-    # Create IAM User
-    user_arn = new_iam_user(iam)
+  iam = session.client('iam', region_name=plan['region'])
 
-    # Create IAM Role
-    role_arn = new_iam_role(iam, user_arn) if (user_arn != 'fail') else 'fail'
+  # Create IAM User
+  user_arn = new_iam_user(iam)
 
-    # Result
-    if role_arn != 'fail':
-      print('A Support Role has been created to manage incidents with AWS Support.')
-    else:
-      print('Failed to create a Support Role to manage incidents with AWS Support.')
+  # Create IAM Role
+  role_arn = new_iam_role(iam, user_arn) if (user_arn != 'fail') else 'fail'
 
+  # Result
+  if role_arn != 'fail':
+    print('A Support Role has been created to manage incidents with AWS Support.')
   else:
-    print('AWS Support policy has one or more attachments: {}'.format(support_policy_arn))
+    print('Failed to create a Support Role to manage incidents with AWS Support.')
 
   return
 
@@ -102,7 +118,7 @@ def new_iam_user(iam):
     user_arn = user['User']['Arn']
     print('New IAM Support User created: {}'.format(user_arn))
 
-    sleep(10)  # Wait for IAM resource to be available. >> Gotta be a better way.. { wait? get? }.
+    wait_for_user(iam, support_user_name)
 
   return user_arn
 
@@ -113,7 +129,10 @@ def new_iam_role(iam, user_arn):
   """
 
   try:
-    role = iam.create_role(
+    # The new user is an invalid principal until it has propagated
+    role = retry_on_propagation(
+      iam.create_role,
+      [ 'MalformedPolicyDocument' ],
       Path = '/',
       RoleName = support_role_name,
       AssumeRolePolicyDocument = json.dumps(Template.RolePolicy(user_arn))
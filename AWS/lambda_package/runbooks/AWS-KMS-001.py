@@ -30,19 +30,32 @@ Sample IAM Policy:
 }
 """
 
-import boto3
 from botocore.exceptions import ClientError
 
 
-def remediate(session, alert, lambda_context):
+def check(session, alert, lambda_context):
   """
-  Main Function invoked by index_prisma.py
+  Check phase invoked by index_prisma.py, returns the remediation plan
   """
 
   key_id = alert['resource_id']
   region = alert['region']
 
-  kms = session.client('kms', region_name=region)
+  return {
+    'key_id'  : key_id,
+    'region'  : region,
+    'actions' : [ 'Enable rotation of KMS key {}.'.format(key_id) ]
+  }
+
+
+def apply(session, plan, lambda_context):
+  """
+  Apply phase invoked by index_prisma.py
+  """
+
+  key_id = plan['key_id']
+
+  kms = session.client('kms', region_name=plan['region'])
 
   try:
     result = kms.enable_key_rotation(KeyId = key_id)
@@ -34,13 +34,12 @@ Sample IAM Policy:
 }
 """
 
-import boto3
 from botocore.exceptions import ClientError
 
 
-def remediate(session, alert, lambda_context):
+def check(session, alert, lambda_context):
   """
-  Main Function invoked by index_prisma.py
+  Check phase invoked by index_prisma.py, returns the remediation plan or None
   """
 
   key_id = alert['resource_id']
@@ -58,17 +57,35 @@ def remediate(session, alert, lambda_context):
   key_status = key_metadata['KeyState']
   
   if key_status == "PendingDeletion":
-    try:
-      result = kms.cancel_key_deletion(KeyId = key_id)
+    return {
+      'key_id'  : key_id,
+      'region'  : region,
+      'actions' : [ 'Cancel the deletion of KMS key {} and disable it.'.format(key_id) ]
+    }
+
+  return
+
+
+def apply(session, plan, lambda_context):
+  """
+  Apply phase invoked by index_prisma.py
+  """
+
+  key_id = plan['key_id']
+
+  kms = session.client('kms', region_name=plan['region'])
+
+  try:
+    result = kms.cancel_key_deletion(KeyId = key_id)
  
-    except ClientError as e:
-      print(e.response['Error']['Message'])
-      return
-
-    try:
-      result = kms.disable_key(KeyId = key_id)
-    except ClientError as e:
-      print(e.response['Error']['Message'])
-    else:
-      print('KMS key disabled for Customer Master Key: {}.'.format(key_id))
+  except ClientError as e:
+    print(e.response['Error']['Message'])
+    return
+
+  try:
+    result = kms.disable_key(KeyId = key_id)
+  except ClientError as e:
+    print(e.response['Error']['Message'])
+  else:
+    print('KMS key disabled for Customer Master Key: {}.'.format(key_id))
   return
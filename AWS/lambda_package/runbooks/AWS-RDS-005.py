@@ -31,13 +31,12 @@ Sample IAM Policy:
 }
 """
 
-import boto3
 from botocore.exceptions import ClientError
 
 
-def remediate(session, alert, lambda_context):
+def check(session, alert, lambda_context):
   """
-  Main Function invoked by index_prisma.py
+  Check phase invoked by index_prisma.py, returns the remediation plan or None
   """
 
   resource_id = alert['resource_id']
@@ -68,17 +67,35 @@ def remediate(session, alert, lambda_context):
 
     instance_id = db_instance[0]['DBInstanceIdentifier']
 
-    try:
-      rds.modify_db_instance(
-        DBInstanceIdentifier = instance_id,
-        PubliclyAccessible = False
-      )
-    except ClientError as e:
-      print(e.response['Error']['Message'])
-      return
-
-    else:
-      print('Removed public attribute from RDS instance {}.'.format(instance_id))
+    return {
+      'instance_id' : instance_id,
+      'region'      : region,
+      'actions'     : [ 'Remove the public attribute from RDS instance {}.'.format(instance_id) ]
+    }
+
+  return
+
+
+def apply(session, plan, lambda_context):
+  """
+  Apply phase invoked by index_prisma.py
+  """
+
+  instance_id = plan['instance_id']
+
+  rds = session.client('rds', region_name=plan['region'])
+
+  try:
+    rds.modify_db_instance(
+      DBInstanceIdentifier = instance_id,
+      PubliclyAccessible = False
+    )
+  except ClientError as e:
+    print(e.response['Error']['Message'])
+    return
+
+  else:
+    print('Removed public attribute from RDS instance {}.'.format(instance_id))
 
   return
 
@@ -34,13 +34,12 @@ Sample IAM Policy:
 }
 """
 
-import boto3
 from botocore.exceptions import ClientError
 
 
-def remediate(session, alert, lambda_context):
+def check(session, alert, lambda_context):
   """
-  Main Function invoked by index_prisma.py
+  Check phase invoked by index_prisma.py, returns the remediation plan or None
   """
 
   snapshot_id = alert['resource_id']
@@ -67,19 +66,36 @@ def remediate(session, alert, lambda_context):
       print('Unable to find public attribute for RDS snapshot {}.'.format(snapshot_id))
 
   if public == True:
-
-    snap_args = {
-      'DBSnapshotIdentifier' : snapshot_id,
-      'AttributeName' : 'restore',
-      'ValuesToRemove' : [ 'all' ]
+    return {
+      'snapshot_id' : snapshot_id,
+      'region'      : region,
+      'actions'     : [ 'Remove the public attribute from RDS snapshot {}.'.format(snapshot_id) ]
     }
 
-    try:
-      results = rds.modify_db_snapshot_attribute(**snap_args)
+  return
+
+
+def apply(session, plan, lambda_context):
+  """
+  Apply phase invoked by index_prisma.py
+  """
+
+  snapshot_id = plan['snapshot_id']
 
-      print('Removed public attribute from RDS snapshot {}.'.format(snapshot_id))
+  rds = session.client('rds', region_name=plan['region'])
 
-    except ClientError as e:
-      print(e.response['Error']['Message'])
+  snap_args = {
+    'DBSnapshotIdentifier' : snapshot_id,
+    'AttributeName' : 'restore',
+    'ValuesToRemove' : [ 'all' ]
+  }
+
+  try:
+    results = rds.modify_db_snapshot_attribute(**snap_args)
+
+    print('Removed public attribute from RDS snapshot {}.'.format(snapshot_id))
+
+  except ClientError as e:
+    print(e.response['Error']['Message'])
 
   return
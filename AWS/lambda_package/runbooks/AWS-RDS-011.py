@@ -40,13 +40,12 @@ Sample IAM Policy:
 }
 """
 
-import boto3
 from botocore.exceptions import ClientError
 
 
-def remediate(session, alert, lambda_context):
+def check(session, alert, lambda_context):
   """
-  Main Function invoked by index_prisma.py
+  Check phase invoked by index_prisma.py, returns the remediation plan or None
   """
 
   resource_id = alert['resource_id']
@@ -79,15 +78,33 @@ def remediate(session, alert, lambda_context):
 
       instance_id = db_instance[0]['DBInstanceIdentifier']
 
-      try:
-        result = rds.modify_db_instance(
-          DBInstanceIdentifier = instance_id,
-          AutoMinorVersionUpgrade = True
-        )
-      except ClientError as e:
-        print(e.response['Error']['Message'])
-      else:
-        print('Enabled \'AutoMinorVersionUpgrade\' for RDS instance {}.'.format(instance_id))
+      return {
+        'instance_id' : instance_id,
+        'region'      : region,
+        'actions'     : [ 'Enable \'AutoMinorVersionUpgrade\' for RDS instance {}.'.format(instance_id) ]
+      }
+
+  return
+
+
+def apply(session, plan, lambda_context):
+  """
+  Apply phase invoked by index_prisma.py
+  """
+
+  instance_id = plan['instance_id']
+
+  rds = session.client('rds', region_name=plan['region'])
+
+  try:
+    result = rds.modify_db_instance(
+      DBInstanceIdentifier = instance_id,
+      AutoMinorVersionUpgrade = True
+    )
+  except ClientError as e:
+    print(e.response['Error']['Message'])
+  else:
+    print('Enabled \'AutoMinorVersionUpgrade\' for RDS instance {}.'.format(instance_id))
 
   return
 
@@ -32,13 +32,12 @@ Sample IAM Policy:
 }
 """
 
-import boto3
 from botocore.exceptions import ClientError
 
 
-def remediate(session, alert, lambda_context):
+def check(session, alert, lambda_context):
   """
-  Main Function invoked by index_prisma.py
+  Check phase invoked by index_prisma.py, returns the remediation plan or None
   """
 
   cluster_id = alert['resource_id']
@@ -58,18 +57,35 @@ def remediate(session, alert, lambda_context):
     public = False
 
   if public == True: 
+    return {
+      'cluster_id' : cluster_id,
+      'region'     : region,
+      'actions'    : [ 'Remove the public attribute from Redshift cluster {}.'.format(cluster_id) ]
+    }
+
+  return
+
+
+def apply(session, plan, lambda_context):
+  """
+  Apply phase invoked by index_prisma.py
+  """
+
+  cluster_id = plan['cluster_id']
+
+  redshift = session.client('redshift', region_name=plan['region'])
+
+  try:
+    redshift.modify_cluster(
+      ClusterIdentifier = cluster_id,
+      PubliclyAccessible = False
+    )
+  except ClientError as e:
+    print(e.response['Error']['Message'])
+    return
 
-    try:
-      redshift.modify_cluster(
-        ClusterIdentifier = cluster_id,
-        PubliclyAccessible = False
-      )
-    except ClientError as e:
-      print(e.response['Error']['Message'])
-      return
-
-    else:
-      print('Removed public attribute from Redshift cluster {}.'.format(cluster_id))
+  else:
+    print('Removed public attribute from Redshift cluster {}.'.format(cluster_id))
 
   return
 
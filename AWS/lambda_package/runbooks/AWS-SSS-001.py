@@ -11,6 +11,9 @@ do not wish for it to persist.
 
 Required Permissions:
 
+- s3:GetBucketLocation (bulk mode)
+- s3:GetBucketVersioning
+- s3:ListAllMyBuckets (bulk mode)
 - s3:PutBucketVersioning
 
 Sample IAM Policy:
@@ -21,6 +24,9 @@ Sample IAM Policy:
     {
       "Sid": "S3Permissions",
       "Action": [
+        "s3:GetBucketLocation",
+        "s3:GetBucketVersioning",
+        "s3:ListAllMyBuckets",
         "s3:PutBucketVersioning"
       ],
       "Effect": "Allow",
@@ -30,13 +36,19 @@ Sample IAM Policy:
 }
 """
 
-import boto3
 from botocore.exceptions import ClientError
+from common import s3_buckets
 
+# Options:
+#
+# Buckets are global, they're listed once in bulk mode
+#
+bulk_scope = 'global'
 
-def remediate(session, alert, lambda_context):
+
+def check(session, alert, lambda_context):
   """
-  Main Function invoked by index_prisma.py
+  Check phase invoked by index_prisma.py, returns the remediation plan or None
   """
 
   bucket = alert['resource_id']
@@ -44,6 +56,29 @@ def remediate(session, alert, lambda_context):
 
   s3 = session.client('s3', region_name=region)
 
+  try:
+    if not bucket_unversioned(s3, bucket):
+      return
+  except ClientError as e:
+    print(e.response['Error']['Message'])
+    return
+
+  return {
+    'bucket'  : bucket,
+    'region'  : region,
+    'actions' : [ 'Enable Object Versioning for S3 bucket: {}.'.format(bucket) ]
+  }
+
+
+def apply(session, plan, lambda_context):
+  """
+  Apply phase invoked by index_prisma.py
+  """
+
+  bucket = plan['bucket']
+
+  s3 = session.client('s3', region_name=plan['region'])
+
   try:
     result = s3.put_bucket_versioning(
       Bucket = bucket,
@@ -60,3 +95,26 @@ def remediate(session, alert, lambda_context):
 
   return
 
+
+def list_resources(session, region):
+  """
+  Buckets of the account, invoked by index_prisma.py in bulk mode
+  """
+
+  return s3_buckets.list_buckets(session, region)
+
+
+def find_violations(session, resources):
+  """
+  Invoked by index_prisma.py in bulk mode
+  """
+
+  return s3_buckets.find_violations(session, resources, bucket_unversioned)
+
+
+def bucket_unversioned(s3, bucket):
+  """
+  Check if Object Versioning is disabled
+  """
+
+  return s3.get_bucket_versioning(Bucket = bucket).get('Status') != 'Enabled'
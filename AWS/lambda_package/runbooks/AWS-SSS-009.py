@@ -43,13 +43,12 @@ Sample IAM Policy:
 }
 """
 
-import boto3
 from botocore.exceptions import ClientError
 
 
-def remediate(session, alert, lambda_context):
+def check(session, alert, lambda_context):
   """
-  Main Function invoked by index_prisma.py
+  Check phase invoked by index_prisma.py, returns the remediation plan or None
   """
 
   bucket_name = alert['resource_id']
@@ -77,12 +76,32 @@ def remediate(session, alert, lambda_context):
   # Grab the AWS account Id
   account_id = get_account_id(sts)
 
+  if account_id == 'fail':
+    return
+
+  return {
+    'bucket_name' : bucket_name,
+    'region'      : region,
+    'account_id'  : account_id,
+    'actions'     : [ 'Enable logging for S3 bucket {} to target bucket {}.'.format(bucket_name, target_bucket_name(account_id, region)) ]
+  }
+
+
+def apply(session, plan, lambda_context):
+  """
+  Apply phase invoked by index_prisma.py
+  """
+
+  region = plan['region']
+
+  s3  = session.client('s3', region_name=region)
+
   # Create new target bucket OR return an existing one
-  target_bucket = new_s3_bucket(s3, account_id, region) if (account_id != 'fail') else 'fail'
+  target_bucket = new_s3_bucket(s3, plan['account_id'], region)
 
   # Enable bucket logging
   if target_bucket != 'fail':
-    result = update_s3_bucket(s3, bucket_name, target_bucket)
+    result = update_s3_bucket(s3, plan['bucket_name'], target_bucket)
 
   return
 
@@ -101,12 +120,20 @@ def get_account_id(sts):
   return account_id
 
 
+def target_bucket_name(account_id, region):
+  """
+  Name of the S3 target bucket
+  """
+
+  return 's3accesslogs-' + account_id + '-' + region
+
+
 def new_s3_bucket(s3, account_id, region):
   """
   Create new S3 target bucket OR return an existing one
   """
 
-  target_bucket = 's3accesslogs-' + account_id + '-' + region
+  target_bucket = target_bucket_name(account_id, region)
 
   try:
     if region == 'us-east-1':
@@ -9,6 +9,9 @@ S3 buckets now require Server Side Encryption on creation of all objects via buc
 
 Required Permissions:
 
+- s3:GetBucketLocation (bulk mode)
+- s3:GetEncryptionConfiguration
+- s3:ListAllMyBuckets (bulk mode)
 - s3:PutEncryptionConfiguration
 
 Sample IAM Policy:
@@ -19,6 +22,9 @@ Sample IAM Policy:
     {
       "Sid": "S3Permissions",
       "Action": [
+        "s3:GetBucketLocation",
+        "s3:GetEncryptionConfiguration",
+        "s3:ListAllMyBuckets",
         "s3:PutEncryptionConfiguration"
       ],
       "Effect": "Allow",
@@ -28,13 +34,19 @@ Sample IAM Policy:
 }
 """
 
-import boto3
 from botocore.exceptions import ClientError
+from common import s3_buckets
 
+# Options:
+#
+# Buckets are global, they're listed once in bulk mode
+#
+bulk_scope = 'global'
 
-def remediate(session, alert, lambda_context):
+
+def check(session, alert, lambda_context):
   """
-  Main Function invoked by index_prisma.py
+  Check phase invoked by index_prisma.py, returns the remediation plan or None
   """
 
   bucket = alert['resource_id']
@@ -42,6 +54,29 @@ def remediate(session, alert, lambda_context):
 
   s3 = session.client('s3', region_name=region)
 
+  try:
+    if not bucket_unencrypted(s3, bucket):
+      return
+  except ClientError as e:
+    print(e.response['Error']['Message'])
+    return
+
+  return {
+    'bucket'  : bucket,
+    'region'  : region,
+    'actions' : [ 'Enable Server Side Encryption for S3 bucket: {}.'.format(bucket) ]
+  }
+
+
+def apply(session, plan, lambda_context):
+  """
+  Apply phase invoked by index_prisma.py
+  """
+
+  bucket = plan['bucket']
+
+  s3 = session.client('s3', region_name=plan['region'])
+
   try:
     result = s3.put_bucket_encryption(
       Bucket = bucket,
@@ -64,3 +99,33 @@ def remediate(session, alert, lambda_context):
 
   return
 
+
+def list_resources(session, region):
+  """
+  Buckets of the account, invoked by index_prisma.py in bulk mode
+  """
+
+  return s3_buckets.list_buckets(session, region)
+
+
+def find_violations(session, resources):
+  """
+  Invoked by index_prisma.py in bulk mode
+  """
+
+  return s3_buckets.find_violations(session, resources, bucket_unencrypted)
+
+
+def bucket_unencrypted(s3, bucket):
+  """
+  Check if the bucket has no default Server Side Encryption
+  """
+
+  try:
+    s3.get_bucket_encryption(Bucket = bucket)
+  except ClientError as e:
+    if e.response['Error']['Code'] == 'ServerSideEncryptionConfigurationNotFoundError':
+      return True
+    raise
+
+  return False
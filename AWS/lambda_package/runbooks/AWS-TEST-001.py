@@ -1,5 +1,3 @@
-import boto3
-
 """
 
 Use the following Test Event to test Lambda:
@@ -31,7 +29,7 @@ Note: The "body" field must be a single line.
 
 """
 
-def remediate(session, alert, lambda_context):
+def check(session, alert, lambda_context):
     print('This runbook is invoked by {}'.format(lambda_context.invoked_function_arn))
     print('Runbook session Details:')
 
@@ -39,4 +37,10 @@ def remediate(session, alert, lambda_context):
 
     resp = client.get_caller_identity()
     print(resp)
+
+    # Nothing to apply, the test is read-only
+    return None
+
+
+def apply(session, plan, lambda_context):
     return 0
@@ -31,13 +31,18 @@ Sample IAM Policy:
 }
 """
 
-import boto3
 from botocore.exceptions import ClientError
 
+# Options:
+#
+# Region-scoped runbook, which can be run across all the regions of an account (sweep mode)
+#
+region_scoped = True
 
-def remediate(session, alert, lambda_context):
+
+def check(session, alert, lambda_context):
   """
-  Main Function invoked by index_prisma.py
+  Check phase invoked by index_prisma.py, returns the remediation plan or None
   """
 
   resource = None
@@ -57,7 +62,26 @@ def remediate(session, alert, lambda_context):
     if 'AssociationId' not in eip:
       unassociated.append(eip['AllocationId'])
 
-  for id in unassociated:
+  if unassociated:
+    return {
+      'region'       : region,
+      'unassociated' : unassociated,
+      'actions'      : [ 'Release unassociated EIP {} in the {} region.'.format(id, region) for id in unassociated ]
+    }
+
+  return
+
+
+def apply(session, plan, lambda_context):
+  """
+  Apply phase invoked by index_prisma.py
+  """
+
+  region = plan['region']
+
+  ec2 = session.client('ec2', region_name=region)
+
+  for id in plan['unassociated']:
     try:
       result = ec2.release_address(AllocationId=id)
     except ClientError as e:
@@ -17,6 +17,7 @@ Required Permissions:
 - logs:CreateLogGroup
 - logs:PutRetentionPolicy
 - ec2:CreateFlowLogs
+- ec2:DescribeFlowLogs
 
 Sample IAM Policy:
 
@@ -46,7 +47,8 @@ Sample IAM Policy:
     {
       "Sid": "EC2Permissions",
       "Action": [
-        "ec2:CreateFlowLogs"
+        "ec2:CreateFlowLogs",
+        "ec2:DescribeFlowLogs"
       ],
       "Effect": "Allow",
       "Resource": "*"
@@ -56,7 +58,6 @@ Sample IAM Policy:
 """
 
 import json
-import boto3
 from botocore.exceptions import ClientError
 
 # Options:
@@ -67,14 +68,48 @@ default_role_name   = 'flowlogsRole'
 default_policy_name = 'flowlogsPolicy'
 
 
-def remediate(session, alert, lambda_context):
+def check(session, alert, lambda_context):
   """
-  Main Function invoked by index_prisma.py
+  Check phase invoked by index_prisma.py, returns the remediation plan or None
   """
 
   vpc_id = alert['resource_id']
   region = alert['region']
 
+  ec2 = session.client('ec2', region_name=region)
+
+  try:
+    flow_logs = ec2.describe_flow_logs(
+      Filters = [
+        {
+          'Name': 'resource-id',
+          'Values': [ vpc_id ]
+        }
+      ]
+    )['FlowLogs']
+  except ClientError as e:
+    print(e.response['Error']['Message'])
+    return
+
+  if flow_logs:
+    return
+
+  return {
+    'vpc_id'  : vpc_id,
+    'region'  : region,
+    'actions' : [ 'Create or update IAM Role {} and CloudWatch Logs group {}.'.format(default_role_name, 'flowlogsGroup' + '-' + vpc_id),
+                  'Enable VPC Flow Logs for VPC: {}'.format(vpc_id) ]
+  }
+
+
+def apply(session, plan, lambda_context):
+  """
+  Apply phase invoked by index_prisma.py
+  """
+
+  vpc_id = plan['vpc_id']
+  region = plan['region']
+
   iam  = session.client('iam', region_name=region)
   logs = session.client('logs', region_name=region)
   ec2  = session.client('ec2', region_name=region)
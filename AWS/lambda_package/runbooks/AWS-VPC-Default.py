@@ -56,13 +56,38 @@ Sample IAM Policy:
 }
 """
 
-import boto3
 from botocore.exceptions import ClientError
+from common.task_graph import run_all, run_graph
 
+# Options:
+#
+# Region-scoped runbook, which can be run across all the regions of an account (sweep mode)
+#
+region_scoped = True
 
-def remediate(session, alert, lambda_context):
+
+def sweep_resources(session, region):
+  """
+  Default VPCs of the region, invoked by index_prisma.py in sweep mode
+  """
+
+  ec2 = session.client('ec2', region_name=region)
+
+  vpcs = ec2.describe_vpcs(
+           Filters = [
+             {
+               'Name': 'isDefault',
+               'Values': [ 'true' ]
+             }
+           ]
+         )['Vpcs']
+
+  return [ vpc['VpcId'] for vpc in vpcs ]
+
+
+def check(session, alert, lambda_context):
   """
-  Main Function invoked by index_prisma.py
+  Check phase invoked by index_prisma.py, returns the remediation plan or None
   """
 
   vpc_id = alert['resource_id']
@@ -102,13 +127,47 @@ def remediate(session, alert, lambda_context):
     print('VPC {} has existing resources.'.format(vpc_id))
     return
 
-  # Do the work..
-  delete_igw(ec2, vpc_id)
-  delete_subs(ec2, vpc_id)
-  delete_rtbs(ec2, vpc_id)
-  delete_acls(ec2, vpc_id)
-  delete_sgps(ec2, vpc_id)
-  delete_vpc(ec2, vpc_id)
+  return {
+    'vpc_id'  : vpc_id,
+    'region'  : region,
+    'actions' : [ 'Delete default VPC {} with its internet gateway, subnets, security groups, route tables and NACLs.'.format(vpc_id) ]
+  }
+
+
+def apply(session, plan, lambda_context):
+  """
+  Apply phase invoked by index_prisma.py
+  """
+
+  vpc_id = plan['vpc_id']
+
+  ec2  = session.client('ec2', region_name=plan['region'])
+
+  # Do the work.. The internet gateway is detached first. Subnets and security groups are then
+  # deleted in parallel, followed by the route tables and NACLs, which can't be deleted while
+  # associated with a subnet. The VPC goes last.
+  results = run_graph(
+    {
+      'igw'  : lambda: delete_igw(ec2, vpc_id),
+      'subs' : lambda: delete_subs(ec2, vpc_id),
+      'sgps' : lambda: delete_sgps(ec2, vpc_id),
+      'rtbs' : lambda: delete_rtbs(ec2, vpc_id),
+      'acls' : lambda: delete_acls(ec2, vpc_id),
+      'vpc'  : lambda: delete_vpc(ec2, vpc_id)
+    },
+    {
+      'subs' : [ 'igw' ],
+      'sgps' : [ 'igw' ],
+      'rtbs' : [ 'subs' ],
+      'acls' : [ 'subs' ],
+      'vpc'  : [ 'sgps', 'rtbs', 'acls' ]
+    }
+  )
+
+  # API errors are reported by each step, anything else is raised to the dispatcher
+  for error in results.values():
+    if error is not None:
+      raise error
 
   return
 
@@ -129,6 +188,7 @@ def delete_igw(ec2, vpc_id):
           )['InternetGateways']
   except ClientError as e:
     print(e.response['Error']['Message'])
+    return
 
   if igw:
     igw_id = igw[0]['InternetGatewayId']
@@ -162,15 +222,9 @@ def delete_subs(ec2, vpc_id):
            )['Subnets']
   except ClientError as e:
     print(e.response['Error']['Message'])
+    return
 
-  if subs:
-    for sub in subs:
-      sub_id = sub['SubnetId']
-
-      try:
-        ec2.delete_subnet(SubnetId=sub_id)
-      except ClientError as e:
-        print(e.response['Error']['Message'])
+  run_all(lambda sub: delete_resource(ec2.delete_subnet, SubnetId=sub['SubnetId']), subs)
 
   return
 
@@ -191,20 +245,12 @@ def delete_rtbs(ec2, vpc_id):
            )['RouteTables']
   except ClientError as e:
     print(e.response['Error']['Message'])
+    return
+
+  # The main route table is deleted along with the VPC
+  rtbs = [ rtb for rtb in rtbs if not any(assoc['Main'] for assoc in rtb['Associations']) ]
 
-  if rtbs:
-    for rtb in rtbs:
-      main = 'false'
-      for assoc in rtb['Associations']:
-        main = assoc['Main']
-      if main == True:
-        continue
-      rtb_id = rtb['RouteTableId']
-        
-      try:
-        ec2.delete_route_table(RouteTableId=rtb_id)
-      except ClientError as e:
-        print(e.response['Error']['Message'])
+  run_all(lambda rtb: delete_resource(ec2.delete_route_table, RouteTableId=rtb['RouteTableId']), rtbs)
 
   return
 
@@ -225,18 +271,11 @@ def delete_acls(ec2, vpc_id):
            )['NetworkAcls']
   except ClientError as e:
     print(e.response['Error']['Message'])
+    return
 
-  if acls:
-    for acl in acls:
-      default = acl['IsDefault']
-      if default == True:
-        continue
-      acl_id = acl['NetworkAclId']
+  acls = [ acl for acl in acls if acl['IsDefault'] != True ]
 
-      try:
-        ec2.delete_network_acl(NetworkAclId=acl_id)
-      except ClientError as e:
-        print(e.response['Error']['Message'])
+  run_all(lambda acl: delete_resource(ec2.delete_network_acl, NetworkAclId=acl['NetworkAclId']), acls)
 
   return
 
@@ -257,18 +296,24 @@ def delete_sgps(ec2, vpc_id):
            )['SecurityGroups']
   except ClientError as e:
     print(e.response['Error']['Message'])
+    return
+
+  sgps = [ sgp for sgp in sgps if sgp['GroupName'] != 'default' ]
+
+  run_all(lambda sgp: delete_resource(ec2.delete_security_group, GroupId=sgp['GroupId']), sgps)
+
+  return
 
-  if sgps:
-    for sgp in sgps:
-      default = sgp['GroupName']
-      if default == 'default':
-        continue
-      sg_id = sgp['GroupId']
-
-      try:
-        ec2.delete_security_group(GroupId=sg_id)
-      except ClientError as e:
-        print(e.response['Error']['Message'])
+
+def delete_resource(delete, **kwargs):
+  """
+  Call a delete API, reporting any error
+  """
+
+  try:
+    delete(**kwargs)
+  except ClientError as e:
+    print(e.response['Error']['Message'])
 
   return
 
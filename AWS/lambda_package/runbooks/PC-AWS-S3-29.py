@@ -28,13 +28,12 @@ Sample IAM Policy:
 }
 """
 
-import boto3
 from botocore.exceptions import ClientError
 
 
-def remediate(session, alert, lambda_context):
+def check(session, alert, lambda_context):
   """
-  Main Function invoked by index_prisma.py
+  Check phase invoked by index_prisma.py, returns the remediation plan or None
   """
   bucket_name  = alert['resource_id']
   region       = alert['region']
@@ -48,6 +47,22 @@ def remediate(session, alert, lambda_context):
     print(e.response['Error']['Message'])
     return
 
+  return {
+    'bucket_name' : bucket_name,
+    'region'      : region,
+    'account'     : account,
+    'actions'     : [ 'Block public access to S3 bucket {}.'.format(bucket_name) ]
+  }
+
+
+def apply(session, plan, lambda_context):
+  """
+  Apply phase invoked by index_prisma.py
+  """
+  bucket_name = plan['bucket_name']
+
+  s3 = session.client('s3', region_name=plan['region'])
+
   # Remove public access at bucket level
   try:
     response = s3.put_public_access_block(
@@ -58,7 +73,7 @@ def remediate(session, alert, lambda_context):
             'BlockPublicPolicy': True,
             'RestrictPublicBuckets': True
         },
-        ExpectedBucketOwner=account
+        ExpectedBucketOwner=plan['account']
     )
   except ClientError as e:
     print(e.response['Error']['Message'])
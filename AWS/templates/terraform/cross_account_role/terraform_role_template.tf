@@ -49,6 +49,7 @@ resource "aws_iam_role_policy" "lambda_policy" {
             "iam:CreateRole",
             "iam:CreateUser",
             "iam:GetPolicy",
+            "iam:GetUser",
             "cloudtrail:DescribeTrails",
             "s3:GetBucketAcl",
             "s3:PutBucketAcl",
@@ -84,6 +85,9 @@ resource "aws_iam_role_policy" "lambda_policy" {
             "ec2:DescribeSnapshotAttribute",
             "ec2:ModifySnapshotAttribute",
             "s3:GetBucketLocation",
+            "s3:GetBucketVersioning",
+            "s3:GetEncryptionConfiguration",
+            "s3:ListAllMyBuckets",
             "kms:CreateAlias",
             "kms:CreateKey",
             "elasticloadbalancing:DescribeLoadBalancerAttributes",
@@ -108,10 +112,15 @@ resource "aws_iam_role_policy" "lambda_policy" {
             "ec2:DescribeInternetGateways",
             "ec2:DescribeNetworkAcls",
             "ec2:DescribeNetworkInterfaces",
+            "ec2:DescribeRegions",
             "ec2:DescribeRouteTables",
             "ec2:DescribeSubnets",
             "ec2:DescribeVpcs",
             "ec2:DetachInternetGateway",
+            "config:DescribeConfigurationRecorderStatus",
+            "config:DescribeDeliveryChannels",
+            "ec2:DescribeFlowLogs",
+            "iam:GetPolicyVersion",
             "iam:PassRole"
           ],
           "Resource": [
@@ -58,6 +58,7 @@ resource "aws_iam_role_policy" "lambda_policy" {
             "iam:CreateRole",
             "iam:CreateUser",
             "iam:GetPolicy",
+            "iam:GetUser",
             "cloudtrail:DescribeTrails",
             "s3:GetBucketAcl",
             "s3:PutBucketAcl",
@@ -93,6 +94,9 @@ resource "aws_iam_role_policy" "lambda_policy" {
             "ec2:DescribeSnapshotAttribute",
             "ec2:ModifySnapshotAttribute",
             "s3:GetBucketLocation",
+            "s3:GetBucketVersioning",
+            "s3:GetEncryptionConfiguration",
+            "s3:ListAllMyBuckets",
             "kms:CreateAlias",
             "kms:CreateKey",
             "elasticloadbalancing:DescribeLoadBalancerAttributes",
@@ -117,10 +121,15 @@ resource "aws_iam_role_policy" "lambda_policy" {
             "ec2:DescribeInternetGateways",
             "ec2:DescribeNetworkAcls",
             "ec2:DescribeNetworkInterfaces",
+            "ec2:DescribeRegions",
             "ec2:DescribeRouteTables",
             "ec2:DescribeSubnets",
             "ec2:DescribeVpcs",
             "ec2:DetachInternetGateway",
+            "config:DescribeConfigurationRecorderStatus",
+            "config:DescribeDeliveryChannels",
+            "ec2:DescribeFlowLogs",
+            "iam:GetPolicyVersion",
             "iam:PassRole"
           ],
           "Resource": [
@@ -192,5 +201,7 @@ resource "aws_lambda_event_source_mapping" "lambda_trigger" {
   event_source_arn = aws_sqs_queue.prisma_remediation_queue.arn
   function_name    = aws_lambda_function.lambda_function.arn
 
+  function_response_types = ["ReportBatchItemFailures"]
+
   depends_on = [aws_sqs_queue.prisma_remediation_queue, aws_lambda_function.lambda_function]
 }
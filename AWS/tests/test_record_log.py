@@ -0,0 +1,75 @@
+"""
+Phase timings of common/logger.py RecordLog, with clients built by the session pool.
+
+Run from the AWS folder, offline:
+
+    python -m unittest discover tests
+"""
+
+import os
+import sys
+import time
+import unittest
+
+LAMBDA_PACKAGE = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'lambda_package')
+
+if LAMBDA_PACKAGE not in sys.path:
+    sys.path.insert(0, LAMBDA_PACKAGE)
+
+from common.logger import RecordLog
+from common.session_pool import SessionPool
+from common.task_graph import run_all
+
+CREDENTIALS = {'AccessKeyId': 'ASIATEST', 'SecretAccessKey': 'test', 'SessionToken': 'test'}
+
+
+class RecordLogTest(unittest.TestCase):
+
+    def assertAddsUp(self, log, elapsed):
+        # The phases add up to the time spent on the record, give or take the rounding
+        self.assertAlmostEqual(sum(log.timings.values()), elapsed, delta=5)
+
+    def test_nested_phase(self):
+        log = RecordLog()
+        start = time.time()
+
+        with log.phase('apply'):
+            time.sleep(0.02)
+
+            with log.phase('session'):
+                time.sleep(0.03)
+
+        elapsed = (time.time() - start) * 1000
+
+        self.assertGreaterEqual(log.timings['session'], 30)
+        self.assertLess(log.timings['apply'], 30)
+        self.assertAddsUp(log, elapsed)
+
+    def test_clients_built_by_worker_threads(self):
+        log = RecordLog()
+        session = SessionPool().session('123456789012', 'us-east-1', CREDENTIALS, log)
+        regions = ['us-east-1', 'us-west-2', 'eu-west-1', 'ap-southeast-2']
+        start = time.time()
+
+        # As AWS-VPC-Default does: the clients are built by the tasks of a graph
+        with log.phase('apply'):
+            clients = run_all(lambda region: session.client('ec2', region_name=region), regions)
+
+        elapsed = (time.time() - start) * 1000
+
+        self.assertEqual([client.meta.region_name for client in clients], regions)
+        self.assertGreater(log.timings['session'], 0)
+        self.assertGreaterEqual(log.timings['apply'], 0)
+        self.assertAddsUp(log, elapsed)
+
+        # Pooled clients take no time to build
+        built = log.timings['session']
+
+        with log.phase('check'):
+            session.client('ec2', region_name='us-east-1')
+
+        self.assertEqual(log.timings['session'], built)
+
+
+if __name__ == '__main__':
+    unittest.main()
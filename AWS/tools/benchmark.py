@@ -0,0 +1,373 @@
+"""
+Throughput benchmark of the dispatcher and the runbooks.
+
+Drives index_prisma.lambda_handler with synthetic Prisma Cloud alerts, offline, against the
+ResponsePlayer of replay.py with a latency injected in each AWS API call. Every runbook of
+runbook_lookup gets a scenario of its own, and a 'mixed' scenario spreads the alerts of each
+batch over all of them. Each alert targets a resource of its own, with an ID in the format its
+runbook reads (the resource factories of generate_alerts.py).
+
+For each scenario, the benchmark measures:
+
+    records_per_sec     records processed per second of lambda_handler wall time
+    p50_ms, p99_ms      latency of a record (sum of its phase timings)
+    api_calls_per_alert AWS API calls made per alert, from the API call profile
+    outcomes            number of records per outcome (remediated, compliant, failed...)
+    peak_rss_mb         peak RSS of the scenario
+
+Each scenario runs in a process of its own, so its peak RSS isn't inflated by the scenarios run
+before it, and every scenario starts from a cold dispatcher (the warm-up batches absorb the
+imports). The results are written as JSON, so two commits can be compared:
+
+    python benchmark.py --output before.json
+    python benchmark.py --output after.json --compare before.json
+
+Usage:
+
+    python benchmark.py                                         # every runbook
+    python benchmark.py --runbooks AWS-EC2-002,AWS-KMS-001 --batches 20
+    python benchmark.py --latency-ms 50 --workers 8             # REMEDIATION_WORKERS=8
+    python benchmark.py --responses responses.json              # see replay.py
+
+By default the API calls are answered from benchmark_responses.json, the describe responses of a
+compliant account, so most runbooks stop after their check phase, and the operations without a
+response get empty responses: the outcomes show which path was measured. A scenario whose records
+all failed has no throughput to report: it is reported as an error, with its most frequent error,
+and the benchmark exits with status 1.
+"""
+
+from __future__ import print_function
+import argparse
+import json
+import math
+import os
+import platform
+import random
+import subprocess
+import sys
+import time
+import uuid
+
+from generate_alerts import alert_body, resource_kind
+from replay import FakeContext, ResponsePlayer, load_dispatcher, replay
+
+DEFAULT_RESPONSES = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'benchmark_responses.json')
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
+
+def synthetic_alert(runbook_id, policy_id, index, account_id, rng, region='us-east-1'):
+    """
+    Prisma Cloud alert body for a policy, with its own resource, whose ID has the format the runbook
+    reads (see generate_alerts.py)
+    """
+
+    resource_type, make_id = resource_kind(runbook_id)
+    resource_id = account_id if make_id is None else make_id(rng, index, account_id, region)
+
+    return alert_body(
+        'P-{}'.format(100000 + index), policy_id, account_id, region, resource_type, resource_id,
+        int(time.time() * 1000)
+    )
+
+
+def sqs_event(alerts):
+    return {'Records': [{'messageId': str(uuid.uuid4()), 'body': json.dumps(alert)} for alert in alerts]}
+
+
+def percentile(values, percent):
+    """
+    Nearest-rank percentile
+    """
+
+    if not values:
+        return 0
+
+    values = sorted(values)
+    return values[max(0, int(math.ceil(percent / 100.0 * len(values))) - 1)]
+
+
+def peak_rss_mb():
+    """
+    Peak RSS of this process since it started, in MB
+    """
+
+    if resource is None:
+        return None
+
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+    # Bytes on macOS, kilobytes on Linux
+    return round(peak / (1024.0 * 1024.0 if sys.platform == 'darwin' else 1024.0), 1)
+
+
+def api_calls(lines):
+    """
+    Number of API calls in the API call profile logged by lambda_handler
+    """
+
+    calls = 0
+
+    for line in lines:
+        try:
+            entry = json.loads(line)
+        except ValueError:
+            continue
+
+        if isinstance(entry, dict) and entry.get('message') == 'API call profile':
+            for operations in entry['runbooks'].values():
+                calls += sum(stats['calls'] for stats in operations.values())
+
+    return calls
+
+
+def run_scenario(dispatcher, policy_ids, batches, batch_size, warmup, account_id):
+    """
+    Run batches of alerts for the given policies, cycling through them
+
+    returns dict of the scenario results (see the module docstring). If every record failed, the
+    results only hold the number of records, the outcomes and the most frequent error.
+    """
+
+    rng = random.Random(1)
+    index = 0
+    latencies = []
+    outcomes = {}
+    errors = {}
+    elapsed = 0
+    calls = 0
+
+    for batch in range(warmup + batches):
+        alerts = []
+
+        for _ in range(batch_size):
+            policy_id = policy_ids[index % len(policy_ids)]
+            alerts.append(synthetic_alert(dispatcher.runbook_lookup[policy_id], policy_id, index, account_id, rng))
+            index += 1
+
+        run = replay(dispatcher, sqs_event(alerts), FakeContext(account_id))
+
+        # The warm-up batches pay the runbook imports and the client creation
+        if batch < warmup:
+            continue
+
+        elapsed += run['elapsed']
+        calls += api_calls(run['lines'])
+
+        for record in run['records']:
+            latencies.append(sum(record.get('timings_ms', {}).values()))
+            outcomes[record.get('outcome')] = outcomes.get(record.get('outcome'), 0) + 1
+
+            if record.get('error'):
+                errors[record['error']] = errors.get(record['error'], 0) + 1
+
+    # Failed records take no time: their throughput would be meaningless
+    if latencies and outcomes.get('failed') == len(latencies):
+        return {
+            'records'  : len(latencies),
+            'outcomes' : outcomes,
+            'error'    : max(sorted(errors), key=errors.get) if errors else 'failed'
+        }
+
+    return {
+        'records'             : len(latencies),
+        'elapsed_sec'         : round(elapsed, 3),
+        'records_per_sec'     : round(len(latencies) / elapsed, 1) if elapsed else 0,
+        'p50_ms'              : round(percentile(latencies, 50), 2),
+        'p99_ms'              : round(percentile(latencies, 99), 2),
+        'api_calls_per_alert' : round(calls / float(len(latencies)), 2) if latencies else 0,
+        'outcomes'            : outcomes,
+        'peak_rss_mb'         : peak_rss_mb()
+    }
+
+
+def git_commit():
+    try:
+        return subprocess.check_output(
+            ['git', 'rev-parse', '--short', 'HEAD'], cwd=os.path.dirname(os.path.abspath(__file__)),
+            stderr=subprocess.DEVNULL, universal_newlines=True
+        ).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def print_results(results, baseline=None):
+    print('#### Benchmark {0} - {1} ms per API call, {2} worker(s) ####'.format(
+        results['commit'] or '', results['settings']['latency_ms'], results['settings']['workers']
+    ))
+    print()
+    print('  {:<20} {:>8} {:>10} {:>10} {:>10} {:>11} {:>8}  {}'.format(
+        'scenario', 'records', 'records/s', 'p50 ms', 'p99 ms', 'calls/alert', 'RSS MB', 'outcomes'
+    ))
+
+    for name, scenario in sorted(results['scenarios'].items()):
+        if 'error' in scenario:
+            print('  {:<20} {:>8}  ERROR: every record failed: {}'.format(name, scenario['records'], scenario['error']))
+            continue
+
+        print('  {:<20} {:>8} {:>10} {:>10} {:>10} {:>11} {:>8}  {}'.format(
+            name, scenario['records'], scenario['records_per_sec'], scenario['p50_ms'], scenario['p99_ms'],
+            scenario['api_calls_per_alert'], scenario['peak_rss_mb'], ' '.join('{0}={1}'.format(k, v) for k, v in sorted(scenario['outcomes'].items()))
+        ))
+
+        previous = (baseline or {}).get('scenarios', {}).get(name)
+
+        if previous and 'error' not in previous:
+            print('  {:<20} {:>8} {:>10} {:>10} {:>10} {:>11} {:>8}'.format(
+                '  vs {}'.format(baseline.get('commit') or 'baseline'), '',
+                delta(scenario['records_per_sec'], previous['records_per_sec']),
+                delta(scenario['p50_ms'], previous['p50_ms']),
+                delta(scenario['p99_ms'], previous['p99_ms']),
+                delta(scenario['api_calls_per_alert'], previous['api_calls_per_alert']),
+                delta(scenario['peak_rss_mb'], previous.get('peak_rss_mb'))
+            ))
+
+    print()
+
+    if results['peak_rss_mb'] is not None:
+        print('Peak RSS: {} MB (largest scenario)'.format(results['peak_rss_mb']))
+
+    failed = sorted(name for name, scenario in results['scenarios'].items() if 'error' in scenario)
+
+    if failed:
+        print('Scenarios where every record failed: {}'.format(', '.join(failed)))
+
+
+def delta(value, previous):
+    if not previous or value is None:
+        return '-'
+
+    return '{:+.1f}%'.format((value - previous) * 100.0 / previous)
+
+
+def scenario_policies(dispatcher, runbooks=None):
+    """
+    Policy IDs of each scenario, keyed by runbook ID, plus 'mixed' if there's more than one runbook
+
+    Raises ValueError on an unknown runbook ID
+    """
+
+    policies = {}
+
+    for policy_id, runbook_id in sorted(dispatcher.runbook_lookup.items()):
+        if runbook_id in dispatcher.runbook_registry:
+            policies.setdefault(runbook_id, []).append(policy_id)
+
+    if runbooks:
+        selected = [runbook_id.strip() for runbook_id in runbooks.split(',')]
+        unknown = set(selected) - set(policies)
+
+        if unknown:
+            raise ValueError('Unknown runbook(s): {}'.format(', '.join(sorted(unknown))))
+
+        policies = dict((runbook_id, policies[runbook_id]) for runbook_id in selected)
+
+    if len(policies) > 1:
+        policies['mixed'] = [policy_ids[0] for _, policy_ids in sorted(policies.items())]
+
+    return policies
+
+
+def run_isolated(name, args):
+    """
+    Run a scenario in a new process
+
+    returns dict of the scenario results
+    """
+
+    command = [
+        sys.executable, os.path.abspath(__file__), '--scenario', name,
+        '--batches', str(args.batches), '--batch-size', str(args.batch_size), '--warmup', str(args.warmup),
+        '--latency-ms', str(args.latency_ms), '--workers', str(args.workers), '--account-id', args.account_id
+    ]
+
+    if args.runbooks:
+        command += ['--runbooks', args.runbooks]
+
+    if args.responses:
+        command += ['--responses', args.responses]
+
+    output = subprocess.check_output(command, universal_newlines=True)
+
+    # The results are the last line, after anything printed while loading the dispatcher
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark lambda_handler and the runbooks with synthetic alerts, offline')
+    parser.add_argument('--runbooks', help='Comma separated runbook IDs (default: every runbook of runbook_lookup)')
+    parser.add_argument('--batches', type=int, default=5, help='Measured SQS batches per scenario')
+    parser.add_argument('--batch-size', type=int, default=10, help='Alerts per SQS batch (SQS allows up to 10, or 10000 with a batch window)')
+    parser.add_argument('--warmup', type=int, default=1, help='Batches run before measuring')
+    parser.add_argument('--latency-ms', type=float, default=20, help='Latency added to each AWS API call')
+    parser.add_argument('--workers', type=int, default=int(os.getenv('REMEDIATION_WORKERS', '1')), help='REMEDIATION_WORKERS')
+    parser.add_argument('--responses', default=DEFAULT_RESPONSES, help='Responses file played to the API calls (see replay.py, default: benchmark_responses.json)')
+    parser.add_argument('--account-id', default='123456789012')
+    parser.add_argument('--output', help='Write the results to this JSON file')
+    parser.add_argument('--compare', help='Results file of a previous run to compare with')
+    parser.add_argument('--scenario', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    os.environ['REMEDIATION_WORKERS'] = str(args.workers)
+    os.environ.setdefault('LOG_LEVEL', 'INFO')
+
+    responses = {}
+
+    if args.responses:
+        with open(args.responses) as source:
+            responses = json.load(source)
+
+    dispatcher = load_dispatcher(ResponsePlayer(responses, latency=args.latency_ms / 1000.0).api_hooks())
+
+    try:
+        policies = scenario_policies(dispatcher, args.runbooks)
+    except ValueError as e:
+        parser.error(str(e))
+
+    # Child process: run a single scenario and print its results
+    if args.scenario:
+        result = run_scenario(dispatcher, policies[args.scenario], args.batches, args.batch_size, args.warmup, args.account_id)
+        print(json.dumps(result))
+        return
+
+    scenarios = {}
+
+    for name in sorted(policies, key=lambda name: (name == 'mixed', name)):
+        print('Running {}...'.format(name), file=sys.stderr)
+        scenarios[name] = run_isolated(name, args)
+
+    peaks = [scenario['peak_rss_mb'] for scenario in scenarios.values() if scenario.get('peak_rss_mb') is not None]
+
+    results = {
+        'commit'      : git_commit(),
+        'python'      : platform.python_version(),
+        'settings'    : {
+            'batches'    : args.batches,
+            'batch_size' : args.batch_size,
+            'latency_ms' : args.latency_ms,
+            'workers'    : args.workers,
+            'responses'  : args.responses
+        },
+        'scenarios'   : scenarios,
+        'peak_rss_mb' : max(peaks) if peaks else None
+    }
+
+    baseline = None
+
+    if args.compare:
+        with open(args.compare) as source:
+            baseline = json.load(source)
+
+    print_results(results, baseline)
+
+    if args.output:
+        with open(args.output, 'w') as output:
+            json.dump(results, output, indent=2, sort_keys=True)
+
+    sys.exit(1 if any('error' in scenario for scenario in scenarios.values()) else 0)
+
+if __name__ == '__main__':
+    main()
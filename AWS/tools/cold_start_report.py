@@ -0,0 +1,143 @@
+"""
+Cold start timing report of the Lambda package.
+
+Imports index_prisma.py in a fresh interpreter with `python -X importtime` (Python 3.7+) and
+breaks the import time down by module, for the eager and/or the lazy import mode.
+
+Usage:
+
+    python cold_start_report.py                     # eager and lazy modes side by side
+    python cold_start_report.py --mode lazy --top 30
+    python cold_start_report.py --preload all       # include the runbooks (PRELOAD_RUNBOOKS)
+    python cold_start_report.py --input lambda.log  # parse importtime lines from a log file
+
+On Lambda, the same raw data is written to CloudWatch Logs by setting the
+PYTHONPROFILEIMPORTTIME env variable to 1. Save the log and pass it with --input.
+"""
+
+from __future__ import print_function
+import argparse
+import os
+import re
+import subprocess
+import sys
+
+LAMBDA_PACKAGE = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'lambda_package')
+
+IMPORTTIME_LINE = re.compile(r'import time:\s+(\d+)\s+\|\s+(\d+)\s+\|(\s*)(\S+)')
+
+
+def parse_importtime(lines):
+    """
+    Parse `-X importtime` output
+
+    returns list of dict:
+        module      : module name
+        self_us     : time spent importing the module itself, in microseconds
+        cumulative  : time including the module's own imports, in microseconds
+        depth       : nesting level of the import
+    """
+
+    modules = []
+
+    for line in lines:
+        match = IMPORTTIME_LINE.search(line)
+
+        if match:
+            modules.append({
+                'module'     : match.group(4),
+                'self_us'    : int(match.group(1)),
+                'cumulative' : int(match.group(2)),
+                'depth'      : (len(match.group(3)) - 1) // 2
+            })
+
+    return modules
+
+
+def profile_import(lazy, preload=''):
+    """
+    Import index_prisma in a subprocess
+
+    returns list of the parsed importtime records
+    """
+
+    env = dict(os.environ)
+    env['LAZY_IMPORTS'] = 'true' if lazy else 'false'
+    env['PRELOAD_RUNBOOKS'] = preload
+    env.setdefault('AWS_DEFAULT_REGION', 'us-east-1')
+
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', 'import index_prisma'],
+        cwd=LAMBDA_PACKAGE, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE,
+        universal_newlines=True
+    )
+
+    if result.returncode != 0:
+        raise RuntimeError('Importing index_prisma failed:\n' + result.stderr)
+
+    return parse_importtime(result.stderr.splitlines())
+
+
+def summarize(modules):
+    """
+    returns dict:
+        total_ms    : total import time
+        packages    : {top-level package: self time in ms}
+        modules     : {module: self time in ms}
+    """
+
+    packages = {}
+    by_module = {}
+
+    for record in modules:
+        package = record['module'].split('.')[0]
+        packages[package] = packages.get(package, 0) + record['self_us'] / 1000.0
+        by_module[record['module']] = by_module.get(record['module'], 0) + record['self_us'] / 1000.0
+
+    return {
+        'total_ms' : sum(record['self_us'] for record in modules) / 1000.0,
+        'packages' : packages,
+        'modules'  : by_module
+    }
+
+
+def print_report(title, summary, top):
+    print('#### {} - total import time: {:.1f} ms ####'.format(title, summary['total_ms']))
+
+    print('\n  By package:')
+    for package, ms in sorted(summary['packages'].items(), key=lambda item: -item[1])[:top]:
+        print('    {:>9.1f} ms  {}'.format(ms, package))
+
+    print('\n  By module:')
+    for module, ms in sorted(summary['modules'].items(), key=lambda item: -item[1])[:top]:
+        print('    {:>9.1f} ms  {}'.format(ms, module))
+
+    print()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Break down the cold start import time of index_prisma.py')
+    parser.add_argument('--mode', choices=['eager', 'lazy', 'both'], default='both')
+    parser.add_argument('--preload', default='', help='PRELOAD_RUNBOOKS value used for the eager mode')
+    parser.add_argument('--top', type=int, default=15, help='Number of packages/modules listed')
+    parser.add_argument('--input', help='Parse importtime lines from this file instead of running the import')
+    args = parser.parse_args()
+
+    if args.input:
+        with open(args.input) as log:
+            print_report(args.input, summarize(parse_importtime(log)), args.top)
+        return
+
+    totals = {}
+
+    for mode in (['eager', 'lazy'] if args.mode == 'both' else [args.mode]):
+        summary = summarize(profile_import(mode == 'lazy', args.preload if mode == 'eager' else ''))
+        totals[mode] = summary['total_ms']
+        print_report('{} imports'.format(mode.capitalize()), summary, args.top)
+
+    if len(totals) == 2:
+        print('Lazy mode saves {:.1f} ms of cold start import time.'.format(totals['eager'] - totals['lazy']))
+
+
+if __name__ == '__main__':
+    main()
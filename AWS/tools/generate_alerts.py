@@ -0,0 +1,348 @@
+"""
+Synthetic Prisma Cloud alert generator, for load-testing the dispatcher.
+
+Generates SQS batches of Prisma Cloud alert messages for the policies of runbook_lookup, with
+resource IDs in the format each runbook reads (ARN, name or ID). The mix of accounts, regions and
+runbooks, the redelivered (duplicate) and the malformed messages are configurable. The output only
+depends on the options: a given --seed gives the same messages, timestamps included, as the clock
+starts at a fixed --start-time.
+
+Usage:
+
+    python generate_alerts.py --count 5000 --output-dir storm/        # one SQS event file per batch
+    python generate_alerts.py --count 100 > events.jsonl              # one SQS event per line
+    python generate_alerts.py --count 2000 --accounts 20 --account-skew 1.5 --runbooks AWS-EC2-002=10,AWS-SSS-008=1
+    python generate_alerts.py --count 1000 --resources 5 --duplicate-rate 0.05 --malformed-rate 0.01
+
+    python replay.py 'storm/*.json' --latency-ms 20
+
+Distributions:
+
+    --accounts N / --account-skew S   N accounts, the k-th one weighted 1/k^S (0: uniform, 1.5: one
+                                      noisy account gets most of the alerts)
+    --regions us-east-1=4,eu-west-1=1 regions and their weights
+    --runbooks AWS-EC2-002=10,...     runbooks and their weights (default: every runbook, uniform)
+    --resources N                     resources per (account, region, runbook); alerts picking the
+                                      same resource are coalesced by the dispatcher
+    --duplicate-rate R                share of the messages redelivering an earlier alert
+    --malformed-rate R                share of the messages that can't be remediated: invalid JSON,
+                                      missing field or unknown policy
+"""
+
+from __future__ import print_function
+import argparse
+import hashlib
+import json
+import os
+import random
+import sys
+import uuid
+
+LAMBDA_PACKAGE = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'lambda_package')
+
+QUEUE_ARN = 'arn:aws:sqs:us-east-1:123456789012:PrismaRemediation'
+
+# Default timestamp of the first message, in milliseconds (the sentTs of the AWS-TEST-001 alert)
+START_TIME = 1600293588125
+
+
+def hex_id(rng, length=17):
+    return ''.join(rng.choice('0123456789abcdef') for _ in range(length))
+
+
+def dbi_resource_id(rng):
+    return 'db-' + ''.join(rng.choice('ABCDEFGHIJKLMNOPQRSTUVWXYZ234567') for _ in range(26))
+
+
+def arn(service, region, account_id, resource):
+    return 'arn:aws:{0}:{1}:{2}:{3}'.format(service, region, account_id, resource)
+
+
+# Resource type and ID of the alerts, by runbook, in the format the runbook reads from resourceId:
+# function(rng, n, account ID, region) returning the ID of the n-th resource
+RESOURCES = {
+    'AWS-CFM-003'      : ('AWS::CloudFormation::Stack', lambda rng, n, account, region: arn('cloudformation', region, account, 'stack/stack-{0}/{1}'.format(n, uuid.UUID(int=rng.getrandbits(128))))),
+    'AWS-CLT-002'      : ('AWS::CloudTrail::Trail', lambda rng, n, account, region: 'trail-{}'.format(n)),
+    'AWS-CLT-004'      : ('AWS::CloudTrail::Trail', lambda rng, n, account, region: 'trail-{}'.format(n)),
+    'AWS-CLT-005'      : ('AWS::CloudTrail::Trail', lambda rng, n, account, region: 'trail-{}'.format(n)),
+    'AWS-CLT-006'      : ('AWS::S3::Bucket', lambda rng, n, account, region: 'cloudtrail-logs-{0}-{1}'.format(n, hex_id(rng, 8))),
+    'AWS-EC2-001'      : ('AWS::EC2::Volume', lambda rng, n, account, region: 'vol-' + hex_id(rng)),
+    'AWS-EC2-036'      : ('AWS::EC2::Image', lambda rng, n, account, region: 'ami-' + hex_id(rng)),
+    'AWS-EC2-042'      : ('AWS::EC2::Snapshot', lambda rng, n, account, region: 'snap-' + hex_id(rng)),
+    'AWS-ELB-015'      : ('AWS::ElasticLoadBalancingV2::LoadBalancer', lambda rng, n, account, region: arn('elasticloadbalancing', region, account, 'loadbalancer/app/alb-{0}/{1}'.format(n, hex_id(rng, 16)))),
+    'AWS-IAM-015'      : ('AWS::IAM::AccessKey', lambda rng, n, account, region: 'AKIA' + hex_id(rng, 16).upper()),
+    'AWS-IAM-016'      : ('AWS::IAM::ManagedPolicy', lambda rng, n, account, region: arn('iam', '', account, 'policy/policy-{}'.format(n))),
+    'AWS-KMS-001'      : ('AWS::KMS::Key', lambda rng, n, account, region: str(uuid.UUID(int=rng.getrandbits(128)))),
+    'AWS-KMS-002'      : ('AWS::KMS::Key', lambda rng, n, account, region: str(uuid.UUID(int=rng.getrandbits(128)))),
+    'AWS-RDS-007'      : ('AWS::RDS::DBSnapshot', lambda rng, n, account, region: 'db-snapshot-{}'.format(n)),
+    'AWS-REDSHIFT-001' : ('AWS::Redshift::Cluster', lambda rng, n, account, region: 'cluster-{}'.format(n)),
+    'AWS-TEST-001'     : ('AWS::EC2::Instance', lambda rng, n, account, region: 'i-' + hex_id(rng)),
+    'AWS-VPC-020'      : ('AWS::EC2::VPC', lambda rng, n, account, region: 'vpc-' + hex_id(rng)),
+    'AWS-VPC-Default'  : ('AWS::EC2::VPC', lambda rng, n, account, region: 'vpc-' + hex_id(rng)),
+}
+
+# Same, by runbook prefix: security group IDs, Classic ELB ARNs (the runbooks read the name after
+# the '/'), RDS instance resource IDs (dbi-resource-id filter) and bucket names
+RESOURCE_PREFIXES = {
+    'AWS-EC2'   : ('AWS::EC2::SecurityGroup', lambda rng, n, account, region: 'sg-' + hex_id(rng)),
+    'AWS-ELB'   : ('AWS::ElasticLoadBalancing::LoadBalancer', lambda rng, n, account, region: arn('elasticloadbalancing', region, account, 'loadbalancer/elb-{}'.format(n))),
+    'AWS-RDS'   : ('AWS::RDS::DBInstance', lambda rng, n, account, region: dbi_resource_id(rng)),
+    'AWS-SSS'   : ('AWS::S3::Bucket', lambda rng, n, account, region: 'bucket-{0}-{1}'.format(n, hex_id(rng, 8))),
+    'PC-AWS-S3' : ('AWS::S3::Bucket', lambda rng, n, account, region: 'bucket-{0}-{1}'.format(n, hex_id(rng, 8))),
+}
+
+# Account level resources: the resource ID is the account ID
+ACCOUNT_RESOURCE = ('AWS::::Account', None)
+
+
+def resource_kind(runbook_id):
+    if runbook_id in RESOURCES:
+        return RESOURCES[runbook_id]
+
+    for prefix, kind in RESOURCE_PREFIXES.items():
+        if runbook_id.startswith(prefix + '-'):
+            return kind
+
+    return ACCOUNT_RESOURCE
+
+
+def alert_body(alert_id, policy_id, account_id, region, resource_type, resource_id, sent_ts):
+    """
+    Prisma Cloud alert message, as sent to the SQS queue
+    """
+
+    return {
+        'sender'           : 'Prisma Cloud',
+        'sentTs'           : sent_ts,
+        'cloudType'        : 'aws',
+        'alertId'          : alert_id,
+        'policyId'         : policy_id,
+        'resourceRegionId' : region,
+        'resourceId'       : resource_id,
+        'accountName'      : 'account-{}'.format(account_id[-4:]),
+        'accountId'        : account_id,
+        'resource'         : {
+            'id'           : resource_id,
+            'name'         : resource_id,
+            'resourceType' : resource_type,
+            'accountId'    : account_id,
+            'regionId'     : region,
+            'tags'         : []
+        }
+    }
+
+
+def parse_weights(value, names=None):
+    """
+    Parse 'a=3,b,c=0.5' into {'a': 3.0, 'b': 1.0, 'c': 0.5}
+    """
+
+    weights = {}
+
+    for item in value.split(','):
+        name, _, weight = item.strip().partition('=')
+
+        if names is not None and name not in names:
+            raise ValueError('Unknown name: {}'.format(name))
+
+        weights[name] = float(weight) if weight else 1.0
+
+    return weights
+
+
+class AlertGenerator(object):
+
+    def __init__(self, policies, accounts, regions, runbooks, resources, duplicate_rate=0, malformed_rate=0, seed=1, start_time=START_TIME):
+        """
+        policies   : {runbook ID: [policy IDs]}
+        accounts   : {account ID: weight}
+        regions    : {region: weight}
+        runbooks   : {runbook ID: weight}
+        resources  : number of resources per (account, region, runbook)
+        start_time : timestamp of the first message, in milliseconds
+        """
+
+        self.rng            = random.Random(seed)
+        self.policies       = policies
+        self.accounts       = sorted(accounts.items())
+        self.regions        = sorted(regions.items())
+        self.runbooks       = sorted(runbooks.items())
+        self.resources      = resources
+        self.duplicate_rate = duplicate_rate
+        self.malformed_rate = malformed_rate
+        self.resource_ids   = {}
+        self.sent           = []
+        self.alert_count    = 0
+        self.clock          = start_time
+        self.stats          = {'alerts': 0, 'duplicates': 0, 'malformed': 0}
+
+    def choose(self, weighted):
+        names, weights = zip(*weighted)
+        return self.rng.choices(names, weights)[0]
+
+    def resource_id(self, account_id, region, runbook_id):
+        """
+        Pick one of the resources of (account, region, runbook), creating their IDs on first use
+        """
+
+        key = (account_id, region, runbook_id)
+
+        if key not in self.resource_ids:
+            resource_type, make_id = resource_kind(runbook_id)
+            ids = [account_id] if make_id is None else [make_id(self.rng, n, account_id, region) for n in range(self.resources)]
+            self.resource_ids[key] = (resource_type, ids)
+
+        resource_type, ids = self.resource_ids[key]
+
+        return resource_type, self.rng.choice(ids)
+
+    def alert(self):
+        account_id = self.choose(self.accounts)
+        region     = self.choose(self.regions)
+        runbook_id = self.choose(self.runbooks)
+
+        resource_type, resource_id = self.resource_id(account_id, region, runbook_id)
+        self.alert_count += 1
+
+        return alert_body(
+            'P-{}'.format(self.alert_count), self.rng.choice(self.policies[runbook_id]),
+            account_id, region, resource_type, resource_id, self.clock
+        )
+
+    def malformed_body(self):
+        alert = self.alert()
+        kind = self.rng.choice(['invalid_json', 'missing_field', 'unknown_policy'])
+
+        if kind == 'invalid_json':
+            return json.dumps(alert)[:-self.rng.randint(2, 20)]
+
+        if kind == 'missing_field':
+            del alert[self.rng.choice(['resourceId', 'resourceRegionId', 'accountId', 'policyId'])]
+        else:
+            alert['policyId'] = str(uuid.UUID(int=self.rng.getrandbits(128)))
+
+        return json.dumps(alert)
+
+    def message(self):
+        """
+        returns an SQS record
+        """
+
+        draw = self.rng.random()
+        receive_count = 1
+
+        if self.sent and draw < self.duplicate_rate:
+            body = self.rng.choice(self.sent)
+            receive_count = 2
+            self.stats['duplicates'] += 1
+        elif draw < self.duplicate_rate + self.malformed_rate:
+            body = self.malformed_body()
+            self.stats['malformed'] += 1
+        else:
+            body = json.dumps(self.alert())
+            self.sent.append(body)
+            self.stats['alerts'] += 1
+
+        # Messages a few milliseconds apart, as during a storm
+        self.clock += self.rng.randint(0, 20)
+        sent = str(self.clock)
+
+        return {
+            'messageId'         : str(uuid.UUID(int=self.rng.getrandbits(128))),
+            'receiptHandle'     : hex_id(self.rng, 64),
+            'body'              : body,
+            'attributes'        : {
+                'ApproximateReceiveCount'          : str(receive_count),
+                'SentTimestamp'                    : sent,
+                'SenderId'                         : QUEUE_ARN.split(':')[4],
+                'ApproximateFirstReceiveTimestamp' : sent
+            },
+            'messageAttributes' : {},
+            'md5OfBody'         : hashlib.md5(body.encode('utf-8')).hexdigest(),
+            'eventSource'       : 'aws:sqs',
+            'eventSourceARN'    : QUEUE_ARN,
+            'awsRegion'         : QUEUE_ARN.split(':')[3]
+        }
+
+    def batches(self, count, batch_size):
+        """
+        Yield SQS events of up to batch_size records, count records in total
+        """
+
+        while count > 0:
+            size = min(batch_size, count)
+            count -= size
+            yield {'Records': [self.message() for _ in range(size)]}
+
+
+def load_policies():
+    """
+    returns {runbook ID: [policy IDs]} for the runbooks of runbook_lookup
+    """
+
+    os.environ.setdefault('LAZY_IMPORTS', 'true')
+    os.environ.setdefault('AWS_DEFAULT_REGION', 'us-east-1')
+
+    if LAMBDA_PACKAGE not in sys.path:
+        sys.path.insert(0, LAMBDA_PACKAGE)
+
+    import index_prisma
+
+    policies = {}
+
+    for policy_id, runbook_id in sorted(index_prisma.runbook_lookup.items()):
+        if runbook_id in index_prisma.runbook_registry:
+            policies.setdefault(runbook_id, []).append(policy_id)
+
+    return policies
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Generate SQS batches of synthetic Prisma Cloud alerts')
+    parser.add_argument('--count', type=int, default=100, help='Number of SQS records')
+    parser.add_argument('--batch-size', type=int, default=10, help='Records per SQS event')
+    parser.add_argument('--accounts', type=int, default=1, help='Number of accounts')
+    parser.add_argument('--account-skew', type=float, default=0, help='Zipf exponent of the account distribution')
+    parser.add_argument('--regions', default='us-east-1', help='Regions and their weights, e.g. us-east-1=4,eu-west-1=1')
+    parser.add_argument('--runbooks', help='Runbooks and their weights (default: every runbook of runbook_lookup)')
+    parser.add_argument('--resources', type=int, default=100, help='Resources per (account, region, runbook)')
+    parser.add_argument('--duplicate-rate', type=float, default=0, help='Share of redelivered messages')
+    parser.add_argument('--malformed-rate', type=float, default=0, help='Share of malformed messages')
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--start-time', type=int, default=START_TIME,
+                        help='Timestamp of the first message, in milliseconds (default: %(default)s, fixed so that the output only depends on --seed)')
+    parser.add_argument('--output-dir', help='Write one SQS event file per batch in this folder, instead of JSON lines to stdout')
+    args = parser.parse_args()
+
+    policies = load_policies()
+
+    try:
+        runbooks = parse_weights(args.runbooks, policies) if args.runbooks else dict((runbook_id, 1.0) for runbook_id in policies)
+    except ValueError as e:
+        parser.error(str(e))
+
+    accounts = dict(
+        ('{:012d}'.format(100000000000 + k * 111111), 1.0 / (k ** args.account_skew))
+        for k in range(1, args.accounts + 1)
+    )
+
+    generator = AlertGenerator(
+        policies, accounts, parse_weights(args.regions), runbooks, max(1, args.resources),
+        args.duplicate_rate, args.malformed_rate, args.seed, args.start_time
+    )
+
+    if args.output_dir and not os.path.isdir(args.output_dir):
+        os.makedirs(args.output_dir)
+
+    for index, event in enumerate(generator.batches(args.count, args.batch_size)):
+        if args.output_dir:
+            with open(os.path.join(args.output_dir, 'batch-{0:05d}.json'.format(index + 1)), 'w') as output:
+                json.dump(event, output)
+        else:
+            print(json.dumps(event))
+
+    print('{alerts} alerts, {duplicates} duplicates, {malformed} malformed'.format(**generator.stats), file=sys.stderr)
+
+
+if __name__ == '__main__':
+    main()
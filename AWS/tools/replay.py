@@ -0,0 +1,335 @@
+"""
+Offline replay of SQS events through index_prisma.lambda_handler.
+
+The events run in-process, against a stand-in for AWS: every API call made by the dispatcher and
+the runbooks is answered by a ResponsePlayer from a responses file, so no network access or AWS
+account is needed. The report lists the outcome and the phase timings of each record, and the
+script exits with status 1 if any record failed, which makes it usable in CI.
+
+Usage:
+
+    python replay.py event.json                             # every AWS call gets an empty response
+    python replay.py event.json --responses ec2-031.json    # recorded/hand-written responses
+    python replay.py events/*.json --strict                 # fail the calls without a response
+    python replay.py event.json --record ec2-031.json       # run against AWS, save the responses
+    python replay.py event.json --latency-ms 40             # each AWS call takes 40 ms
+
+An event file holds an SQS event ({"Records": [...]}), a list of SQS records, or a list of Prisma
+alert bodies (the "body" of the records). The responses file maps each operation to the parsed
+response, or to a list of responses played in order (the last one is repeated):
+
+    {
+      "ec2.DescribeSecurityGroups": {"SecurityGroups": [{"GroupId": "sg-1", ...}]},
+      "ec2.RevokeSecurityGroupIngress": [{"Error": {"Code": "Throttling", "Message": "Rate exceeded"}}, {}]
+    }
+
+A response with an "Error" is raised as a ClientError. Operations without a response return an
+empty response (empty lists for the list members), or fail with --strict. sts.AssumeRole returns
+temporary credentials unless recorded, so cross account alerts replay as well.
+
+Recorded timestamps are replayed as strings.
+"""
+
+from __future__ import print_function
+import argparse
+import contextlib
+import copy
+from datetime import datetime, timedelta, timezone
+import glob
+import io
+import json
+import os
+import sys
+import threading
+import time
+import uuid
+
+LAMBDA_PACKAGE = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'lambda_package')
+
+ACCOUNT_ID = '123456789012'
+
+
+class ResponsePlayer(object):
+    """
+    In-process stand-in for AWS, answering the API calls from the recorded responses.
+    Each call can be delayed by latency seconds, to mimic the round trip to AWS.
+    """
+
+    def __init__(self, responses=None, strict=False, latency=0):
+        self.responses = responses or {}
+        self.strict    = strict
+        self.latency   = latency
+        self.played    = {}
+        self.missing   = set()
+        self.lock      = threading.Lock()
+
+    def response(self, operation, model):
+        with self.lock:
+            recorded = self.responses.get(operation)
+
+            if isinstance(recorded, list):
+                index = self.played.get(operation, 0)
+                self.played[operation] = index + 1
+                recorded = recorded[min(index, len(recorded) - 1)] if recorded else None
+
+        if recorded is not None:
+            return recorded
+
+        if operation == 'sts.AssumeRole':
+            return assume_role_response()
+
+        with self.lock:
+            self.missing.add(operation)
+
+        if self.strict:
+            return {'Error': {'Code': 'NoRecordedResponse', 'Message': 'No response recorded for {}'.format(operation)}}
+
+        return empty_response(model)
+
+    def api_hooks(self):
+        """
+        botocore event handlers answering the API calls, as (event, handler) tuples
+        """
+
+        from botocore.awsrequest import AWSResponse
+
+        def before_call(model=None, **kwargs):
+            operation = '{0}.{1}'.format(model.service_model.service_name, model.name)
+
+            # A copy: botocore decodes some members of the response in place, e.g. IAM policy documents
+            parsed = copy.deepcopy(self.response(operation, model))
+
+            if 'Error' in parsed:
+                status_code = parsed.get('ResponseMetadata', {}).get('HTTPStatusCode', 400)
+            else:
+                status_code = 200
+
+            parsed.setdefault('ResponseMetadata', {'HTTPStatusCode': status_code, 'RetryAttempts': 0})
+
+            if self.latency:
+                time.sleep(self.latency)
+
+            return AWSResponse('https://replay.invalid', status_code, {}, None), parsed
+
+        return [('before-call', before_call)]
+
+
+class ResponseRecorder(object):
+    """
+    Records the responses of the API calls made against AWS, in the format read by ResponsePlayer
+    """
+
+    def __init__(self):
+        self.responses = {}
+        self.lock      = threading.Lock()
+
+    def api_hooks(self):
+        def after_call(parsed=None, model=None, **kwargs):
+            operation = '{0}.{1}'.format(model.service_model.service_name, model.name)
+            parsed = dict(parsed or {})
+            parsed.pop('ResponseMetadata', None)
+
+            with self.lock:
+                self.responses.setdefault(operation, []).append(parsed)
+
+        return [('after-call', after_call)]
+
+    def save(self, path):
+        with open(path, 'w') as output:
+            json.dump(self.responses, output, indent=2, sort_keys=True, default=str)
+
+
+def assume_role_response():
+    return {
+        'Credentials': {
+            'AccessKeyId': 'ASIAREPLAY',
+            'SecretAccessKey': 'replay',
+            'SessionToken': 'replay',
+            'Expiration': datetime.now(timezone.utc) + timedelta(hours=1)
+        }
+    }
+
+
+def empty_response(model):
+    """
+    Response without any resource: the list and map members of the output shape are left empty
+    """
+
+    response = {}
+
+    if model.output_shape is not None:
+        for name, shape in model.output_shape.members.items():
+            if shape.type_name == 'list':
+                response[name] = []
+            elif shape.type_name == 'map':
+                response[name] = {}
+
+    return response
+
+
+class FakeContext(object):
+    """
+    Lambda context object of the replayed invocations
+    """
+
+    def __init__(self, account_id=ACCOUNT_ID, region='us-east-1', timeout=900):
+        self.function_name = 'prisma-remediation-replay'
+        self.invoked_function_arn = 'arn:aws:lambda:{0}:{1}:function:{2}'.format(region, account_id, self.function_name)
+        self.aws_request_id = str(uuid.uuid4())
+        self.deadline = time.time() + timeout
+
+    def get_remaining_time_in_millis(self):
+        return max(0, int((self.deadline - time.time()) * 1000))
+
+
+def load_events(path):
+    """
+    returns list of SQS events read from an event file (see the module docstring)
+    """
+
+    with open(path) as source:
+        content = json.load(source)
+
+    if isinstance(content, dict):
+        return [content]
+
+    records = []
+
+    for item in content:
+        if 'body' in item:
+            records.append(item)
+        else:
+            records.append({'messageId': str(uuid.uuid4()), 'body': json.dumps(item)})
+
+    return [{'Records': records}]
+
+
+def load_dispatcher(hooks, offline=True):
+    """
+    Import index_prisma, with its session pool and STS client built on the given botocore hooks.
+    Offline, the requests are signed with dummy credentials.
+    """
+
+    if offline:
+        os.environ.setdefault('AWS_ACCESS_KEY_ID', 'replay')
+        os.environ.setdefault('AWS_SECRET_ACCESS_KEY', 'replay')
+
+    os.environ.setdefault('AWS_DEFAULT_REGION', 'us-east-1')
+    os.environ.setdefault('CROSS_ACCOUNT_ROLE_NAME', 'PrismaRemediationRole')
+    os.environ.setdefault('IDEMPOTENCY_STORE', 'none')
+
+    if LAMBDA_PACKAGE not in sys.path:
+        sys.path.insert(0, LAMBDA_PACKAGE)
+
+    import index_prisma
+
+    # The pool has no session yet, so the hooks apply to its shared session
+    index_prisma.get_session_pool().hooks.extend(hooks)
+
+    sts = index_prisma.get_sts_client()
+
+    for event_name, handler in hooks:
+        sts.meta.events.register(event_name, handler)
+
+    return index_prisma
+
+
+def replay(dispatcher, event, context):
+    """
+    Run an event through lambda_handler, capturing its output
+
+    returns dict:
+        'result'    : value returned by lambda_handler
+        'lines'     : output lines
+        'records'   : the JSON record lines logged by the dispatcher
+        'elapsed'   : wall time, in seconds
+    """
+
+    output = io.StringIO()
+    start = time.time()
+
+    with contextlib.redirect_stdout(output):
+        result = dispatcher.lambda_handler(event, context)
+
+    elapsed = time.time() - start
+    lines = output.getvalue().splitlines()
+    records = []
+
+    for line in lines:
+        try:
+            entry = json.loads(line)
+        except ValueError:
+            continue
+
+        if isinstance(entry, dict) and entry.get('message') == 'record':
+            records.append(entry)
+
+    return {'result': result, 'lines': lines, 'records': records, 'elapsed': elapsed}
+
+
+def print_report(name, run):
+    print('#### {0} - {1} records in {2:.1f} ms ####'.format(name, len(run['records']), run['elapsed'] * 1000))
+    print()
+    print('  {:<38} {:<20} {:<11} {:>10}  {}'.format('messageId', 'runbook', 'outcome', 'total ms', 'phases (ms)'))
+
+    for record in run['records']:
+        timings = record.get('timings_ms', {})
+
+        print('  {:<38} {:<20} {:<11} {:>10.2f}  {}'.format(
+            record.get('message_id', '-'), record.get('runbook_id', '-'), record.get('outcome', '-'),
+            sum(timings.values()), ' '.join('{0}={1}'.format(phase, ms) for phase, ms in timings.items())
+        ))
+
+        if record.get('error'):
+            print('  {:<38} error: {}'.format('', record['error']))
+
+    print()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Replay SQS events through index_prisma.lambda_handler, offline')
+    parser.add_argument('events', nargs='+', help='Event files (glob patterns are expanded)')
+    parser.add_argument('--responses', help='Responses file played to the API calls')
+    parser.add_argument('--strict', action='store_true', help='Fail the API calls without a recorded response')
+    parser.add_argument('--record', help='Run against AWS and save the responses to this file')
+    parser.add_argument('--latency-ms', type=float, default=0, help='Latency added to each replayed API call')
+    parser.add_argument('--account-id', default=ACCOUNT_ID, help='Account of the Lambda function (same account alerts skip AssumeRole)')
+    parser.add_argument('--verbose', action='store_true', help='Print the output of the dispatcher and the runbooks')
+    args = parser.parse_args()
+
+    if args.record:
+        player = ResponseRecorder()
+    else:
+        responses = {}
+
+        if args.responses:
+            with open(args.responses) as source:
+                responses = json.load(source)
+
+        player = ResponsePlayer(responses, args.strict, args.latency_ms / 1000.0)
+
+    dispatcher = load_dispatcher(player.api_hooks(), offline=not args.record)
+    failed = 0
+
+    for pattern in args.events:
+        for path in sorted(glob.glob(pattern)) or [pattern]:
+            for event in load_events(path):
+                run = replay(dispatcher, event, FakeContext(args.account_id))
+
+                if args.verbose:
+                    print('\n'.join(run['lines']))
+
+                print_report(path, run)
+                failed += len(run['result'].get('batchItemFailures', []))
+
+    if args.record:
+        player.save(args.record)
+        print('Responses saved to {}'.format(args.record))
+    elif player.missing:
+        print('Operations without a recorded response: {}'.format(', '.join(sorted(player.missing))))
+
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == '__main__':
+    main()